@@ -45,15 +45,17 @@ def main():
         return x * x
     
     @ray.remote
-    def compute_pi_chunk(n_samples):
-        """计算π的一部分（蒙特卡洛方法）"""
-        import random
-        count = 0
-        for _ in range(n_samples):
-            x, y = random.random(), random.random()
-            if x*x + y*y <= 1:
-                count += 1
-        return 4.0 * count / n_samples
+    def compute_pi_hits(n_samples, seed, block_size=1 << 18):
+        """计算落在单位圆内的点数（向量化蒙特卡洛方法，分块采样限制内存）"""
+        rng = np.random.default_rng(seed)
+        hits = 0
+        remaining = n_samples
+        while remaining > 0:
+            m = min(block_size, remaining)
+            x, y = rng.random((2, m))
+            hits += int(np.count_nonzero(x*x + y*y <= 1))
+            remaining -= m
+        return hits
     
     # 演示1：并行计算平方
     print("\n=== 演示1：并行计算平方 ===")
@@ -76,18 +78,20 @@ def main():
     samples_per_task = 1000000
     
     start_time = time.time()
-    # 创建远程任务
-    pi_futures = [compute_pi_chunk.remote(samples_per_task) for _ in range(n_tasks)]
-    # 获取结果
-    pi_results = ray.get(pi_futures)
-    pi_estimate = sum(pi_results) / len(pi_results)
+    # 创建远程任务（每个任务使用独立的随机数流）
+    seeds = np.random.SeedSequence(2024).spawn(n_tasks)
+    pi_futures = [compute_pi_hits.remote(samples_per_task, s) for s in seeds]
+    # 获取结果：先汇总命中数，再计算π
+    hit_results = ray.get(pi_futures)
+    pi_estimate = 4.0 * sum(hit_results) / (n_tasks * samples_per_task)
     elapsed_time = time.time() - start_time
     
-    print(f"各任务的π估算: {[f'{x:.6f}' for x in pi_results]}")
+    print(f"各任务的π估算: {[f'{4.0 * h / samples_per_task:.6f}' for h in hit_results]}")
     print(f"最终π估算: {pi_estimate:.6f}")
     print(f"真实π值: {np.pi:.6f}")
     print(f"误差: {abs(pi_estimate - np.pi):.6f}")
     print(f"计算时间: {elapsed_time:.3f}秒")
+    print(f"吞吐量: {n_tasks * samples_per_task / elapsed_time:,.0f} 样本/秒")
     
     # 演示3：Ray Actor
     print("\n=== 演示3：Ray Actor ===")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Ray 分布式计算基准测试
+覆盖 π 估算、矩阵乘法、聚合管道和 Actor 吞吐等场景，
+支持预热、重复运行、多种 CPU 数的扩展曲线，结果追加到 JSON 历史文件
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import ray
+
+from ray_main import (
+    DataProcessorPool,
+    RayDistributedSystem,
+    aggregate_chunk,
+    empty_aggregate,
+    estimate_pi,
+    finalize_aggregate,
+    logger,
+    merge_aggregates,
+    stream_tasks,
+)
+
+# 默认的结果历史文件
+DEFAULT_HISTORY_FILE = "benchmark_history.json"
+# 中位数比上一次同条件结果慢超过该比例时标记为回归
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+# 只与这些字段都相同的历史结果比较
+COMPARE_MACHINE_KEYS = ("host", "ray", "numpy")
+COMPARE_RECORD_KEYS = ("scenario", "size", "num_cpus", "warmup", "repeats")
+
+
+def setup_pi(system: RayDistributedSystem, size: int) -> Callable[[], Any]:
+    """size 为总样本数，按 CPU 数切分任务"""
+    n_tasks = system.num_cpus
+    return lambda: estimate_pi(
+        n_tasks, size // n_tasks, engine="vectorized", log_interval=None
+    )
+
+
+def setup_matmul(system: RayDistributedSystem, size: int) -> Callable[[], Any]:
+    """size 为方阵边长"""
+    A = np.random.random((size, size))
+    B = np.random.random((size, size))
+    return lambda: system.blocked_matmul(A, B, log_interval=None)
+
+
+def setup_aggregate(system: RayDistributedSystem, size: int) -> Callable[[], Any]:
+    """size 为数据点数，切分为 4 * num_cpus 个数据块"""
+    data = np.random.random(size)
+    chunk_size = max(1, -(-size // (4 * system.num_cpus)))
+    chunk_refs = [ray.put(data[i : i + chunk_size]) for i in range(0, size, chunk_size)]
+
+    def run():
+        state = empty_aggregate()
+        for _, partial in stream_tasks(
+            aggregate_chunk.remote, chunk_refs, log_interval=None
+        ):
+            state = merge_aggregates(state, partial)
+        return finalize_aggregate(state)
+
+    return run
+
+
+def setup_actors(system: RayDistributedSystem, size: int) -> Callable[[], Any]:
+    """size 为批次数，每批 100000 个数据点，由 num_cpus 个 DataProcessor 处理"""
+    pool = DataProcessorPool(min_actors=system.num_cpus)
+    batch_ref = ray.put(np.random.random(100000))
+    batches = [batch_ref] * size
+    return lambda: list(pool.imap_unordered(batches))
+
+
+# 场景名 -> (准备函数, 默认问题规模, 规模单位)
+SCENARIOS = {
+    "pi": (setup_pi, 16000000, "samples"),
+    "matmul": (setup_matmul, 2000, "n"),
+    "aggregate": (setup_aggregate, 10000000, "points"),
+    "actors": (setup_actors, 200, "batches"),
+}
+
+
+def machine_info() -> Dict[str, Any]:
+    """记录运行环境，只与同一台机器上的历史结果比较"""
+    return {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "ray": ray.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def time_scenario(run: Callable[[], Any], warmup: int, repeats: int) -> List[float]:
+    """预热 warmup 次后重复运行 repeats 次，返回每次的耗时（秒）"""
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start_time)
+    return times
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(path: str, history: List[Dict[str, Any]]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def find_previous(
+    history: List[Dict[str, Any]], record: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    同一台机器、同样的 Ray / NumPy 版本、同一场景、同样规模、CPU 数、
+    预热和重复次数的最近一次结果；条件不同的结果不可比较
+    """
+    for previous in reversed(history):
+        if all(
+            previous["machine"].get(key) == record["machine"][key]
+            for key in COMPARE_MACHINE_KEYS
+        ) and all(previous.get(key) == record[key] for key in COMPARE_RECORD_KEYS):
+            return previous
+    return None
+
+
+def run_benchmarks(
+    scenarios: List[str],
+    num_cpus_list: List[int],
+    sizes: Dict[str, int] = None,
+    warmup: int = 1,
+    repeats: int = 5,
+    history_file: str = DEFAULT_HISTORY_FILE,
+    regression_threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    运行基准测试并把结果追加到历史文件
+
+    Args:
+        scenarios: 场景名列表，见 SCENARIOS
+        num_cpus_list: 依次以这些 CPU 数启动 Ray，得到扩展曲线
+        sizes: 各场景的问题规模，缺省使用 SCENARIOS 中的默认值
+        warmup: 每个场景的预热次数
+        repeats: 每个场景计时的重复次数
+        history_file: JSON 历史文件路径
+        regression_threshold: 中位数变慢超过该比例时记录为回归
+
+    Returns:
+        本次运行的结果记录
+    """
+    sizes = sizes or {}
+    history = load_history(history_file)
+    machine = machine_info()
+    records = []
+
+    for num_cpus in num_cpus_list:
+        system = RayDistributedSystem(num_cpus=num_cpus)
+        try:
+            for scenario in scenarios:
+                setup, default_size, unit = SCENARIOS[scenario]
+                size = sizes.get(scenario, default_size)
+                times = time_scenario(setup(system, size), warmup, repeats)
+                median, p95 = np.percentile(times, [50, 95])
+                record = {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "machine": machine,
+                    "scenario": scenario,
+                    "size": size,
+                    "unit": unit,
+                    "num_cpus": num_cpus,
+                    "warmup": warmup,
+                    "repeats": repeats,
+                    "times": times,
+                    "median": float(median),
+                    "p95": float(p95),
+                    "throughput": size / median,
+                }
+
+                message = (
+                    f"[{scenario}] num_cpus={num_cpus} size={size} {unit}: "
+                    f"median={median:.3f}s p95={p95:.3f}s "
+                    f"({size / median:,.0f} {unit}/s)"
+                )
+                previous = find_previous(history, record)
+                if previous is not None:
+                    change = record["median"] / previous["median"] - 1
+                    record["change_vs_previous"] = change
+                    record["regression"] = change > regression_threshold
+                    message += f", {change:+.1%} vs previous"
+                    if record["regression"]:
+                        message += " REGRESSION"
+                logger.info(message)
+
+                records.append(record)
+                history.append(record)
+        finally:
+            system.shutdown()
+
+    save_history(history_file, history)
+    log_scaling(records)
+    return records
+
+
+def log_scaling(records: List[Dict[str, Any]]):
+    """输出各场景相对最小 CPU 数的加速比"""
+    by_scenario = {}
+    for record in records:
+        by_scenario.setdefault(record["scenario"], []).append(record)
+    for scenario, results in by_scenario.items():
+        if len(results) < 2:
+            continue
+        results.sort(key=lambda r: r["num_cpus"])
+        base = results[0]
+        curve = ", ".join(
+            f"{r['num_cpus']} CPUs: {base['median'] / r['median']:.2f}x"
+            for r in results
+        )
+        logger.info(f"[{scenario}] scaling vs {base['num_cpus']} CPUs: {curve}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ray workload benchmarks")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=sorted(SCENARIOS),
+        default=sorted(SCENARIOS),
+        help="scenarios to run",
+    )
+    parser.add_argument(
+        "--num-cpus",
+        nargs="+",
+        type=int,
+        default=[os.cpu_count()],
+        help="CPU counts to start Ray with, one run per value for scaling curves",
+    )
+    parser.add_argument(
+        "--size",
+        action="append",
+        default=[],
+        metavar="SCENARIO=N",
+        help="problem size for a scenario, e.g. --size matmul=4000",
+    )
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--history", default=DEFAULT_HISTORY_FILE)
+    parser.add_argument(
+        "--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD
+    )
+    args = parser.parse_args()
+
+    sizes = {}
+    for item in args.size:
+        scenario, _, value = item.partition("=")
+        if scenario not in SCENARIOS or not value:
+            parser.error(f"invalid --size {item!r}")
+        sizes[scenario] = int(value)
+
+    records = run_benchmarks(
+        args.scenarios,
+        args.num_cpus,
+        sizes=sizes,
+        warmup=args.warmup,
+        repeats=args.repeats,
+        history_file=args.history,
+        regression_threshold=args.regression_threshold,
+    )
+    regressions = [r for r in records if r.get("regression")]
+    if regressions:
+        logger.warning(
+            "Regressions detected: "
+            + ", ".join(f"{r['scenario']}@{r['num_cpus']}" for r in regressions)
+        )
+
+
+if __name__ == "__main__":
+    main()
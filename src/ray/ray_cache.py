@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+确定性远程函数的结果缓存
+按参数摘要（ndarray 按内容计算）缓存结果：集群内 ObjectRef 的 LRU 内存层，
+以及重启后仍然有效的磁盘层
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+import numpy as np
+import ray
+
+from ray_main import logger, matrix_multiply, process_data_chunk
+
+# 默认的磁盘缓存目录
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ray_task_cache")
+# 每多少次未命中检查一次磁盘层的大小上限
+PRUNE_INTERVAL = 64
+
+
+def _feed(hasher: Any, value: Any):
+    """把参数写入摘要；ndarray 直接按内存内容计算，不经过 pickle"""
+    if isinstance(value, np.ndarray):
+        hasher.update(f"ndarray:{value.dtype.str}:{value.shape}:".encode())
+        hasher.update(memoryview(np.ascontiguousarray(value)).cast("B"))
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"{type(value).__name__}:{len(value)}:".encode())
+        for item in value:
+            _feed(hasher, item)
+    elif isinstance(value, dict):
+        hasher.update(f"dict:{len(value)}:".encode())
+        for key in sorted(value, key=repr):
+            _feed(hasher, key)
+            _feed(hasher, value[key])
+    elif isinstance(value, ray.ObjectRef):
+        # 只按引用区分，内容相同的不同 ObjectRef 不会命中
+        hasher.update(f"ref:{value.hex()}".encode())
+    else:
+        hasher.update(pickle.dumps(value, protocol=5))
+
+
+def digest_args(name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """计算 函数名 + 参数 的摘要，作为缓存键"""
+    hasher = hashlib.blake2b(digest_size=16)
+    _feed(hasher, (args, kwargs))
+    return f"{name}-{hasher.hexdigest()}"
+
+
+def result_nbytes(result: Any) -> int:
+    """结果在对象存储中的大致大小：ndarray 按 nbytes，其他按 pickle 后的长度"""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    return len(pickle.dumps(result, protocol=5))
+
+
+def _write_atomic(path: str, result: Any):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(result, f, protocol=5)
+    os.replace(tmp_path, path)
+
+
+@ray.remote
+def load_cached_result(path: str) -> Any:
+    """远程函数：从磁盘缓存读取结果，数据不经过 driver"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class CachedRemoteFunction:
+    """
+    带缓存的远程函数，用法与原远程函数相同：cached.remote(*args) 返回 ObjectRef
+
+    store_fn 有两个返回值：结果及其字节数，字节数用于内存层的大小上限。
+    """
+
+    def __init__(self, cache: "TaskCache", remote_fn: Any):
+        self.cache = cache
+        fn = remote_fn._function
+        self.name = f"{fn.__module__}.{fn.__qualname__}"
+
+        def call_and_store(path, *args, **kwargs):
+            result = fn(*args, **kwargs)
+            if path is not None:
+                _write_atomic(path, result)
+                return result, os.path.getsize(path)
+            return result, result_nbytes(result)
+
+        self.store_fn = ray.remote(num_returns=2)(call_and_store)
+
+    def remote(self, *args, **kwargs) -> ray.ObjectRef:
+        return self.cache._lookup(self, args, kwargs)
+
+
+class TaskCache:
+    """
+    确定性远程函数的结果缓存（需要显式通过 wrap 启用）
+
+    - 内存层：缓存键 -> 集群内的 ObjectRef，LRU，最多 max_entries 个，
+      且结果总大小不超过 max_memory_bytes（每个条目都会让结果留在对象存储中）；
+      未命中时结果大小在任务完成后才知道，尚未完成的条目暂不计入
+    - 磁盘层：cache_dir 下每个键一个 pickle 文件，由 worker 在任务完成时写入，
+      按修改时间 LRU，总大小不超过 max_disk_bytes；cache_dir 为 None 时不启用
+
+    只应对结果完全由参数决定的函数使用；任务失败时内存层会缓存该失败，
+    可以用 invalidate 清除。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_disk_bytes: int = 4 * 1024**3,
+        max_memory_bytes: int = 1024**3,
+    ):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.entries = OrderedDict()
+        # 缓存键 -> 结果字节数；任务未完成时为返回字节数的 ObjectRef
+        self.sizes = {}
+        self.memory_bytes = 0
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def wrap(self, remote_fn: Any) -> CachedRemoteFunction:
+        """为远程函数启用缓存，如 cache.wrap(matrix_multiply)"""
+        return CachedRemoteFunction(self, remote_fn)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _lookup(
+        self, cached: CachedRemoteFunction, args: tuple, kwargs: Dict[str, Any]
+    ) -> ray.ObjectRef:
+        key = digest_args(cached.name, args, kwargs)
+
+        ref = self.entries.get(key)
+        if ref is not None:
+            self.entries.move_to_end(key)
+            self.metrics["memory_hits"] += 1
+            return ref
+
+        path = self._path(key) if self.cache_dir is not None else None
+        if path is not None and os.path.exists(path):
+            os.utime(path)
+            ref = load_cached_result.remote(path)
+            size = os.path.getsize(path)
+            self.memory_bytes += size
+            self.metrics["disk_hits"] += 1
+        else:
+            ref, size = cached.store_fn.remote(path, *args, **kwargs)
+            self.metrics["misses"] += 1
+            if path is not None and self.metrics["misses"] % PRUNE_INTERVAL == 0:
+                self.prune_disk()
+
+        self.entries[key] = ref
+        self.sizes[key] = size
+        self._resolve_sizes()
+        while self.entries and (
+            len(self.entries) > self.max_entries
+            or self.memory_bytes > self.max_memory_bytes
+        ):
+            self._evict(next(iter(self.entries)))
+            self.metrics["evictions"] += 1
+        return ref
+
+    def _resolve_sizes(self):
+        """把已完成任务的结果大小计入 memory_bytes，不等待未完成的任务"""
+        pending = {
+            size: key
+            for key, size in self.sizes.items()
+            if isinstance(size, ray.ObjectRef)
+        }
+        if not pending:
+            return
+        ready, _ = ray.wait(list(pending), num_returns=len(pending), timeout=0)
+        for size_ref in ready:
+            try:
+                size = ray.get(size_ref)
+            except ray.exceptions.RayError:
+                # 失败的任务只缓存异常，不占用结果大小
+                size = 0
+            self.sizes[pending[size_ref]] = size
+            self.memory_bytes += size
+
+    def _evict(self, key: str):
+        del self.entries[key]
+        size = self.sizes.pop(key)
+        if not isinstance(size, ray.ObjectRef):
+            self.memory_bytes -= size
+
+    def prune_disk(self):
+        """删除最久未使用的磁盘缓存文件，直到总大小不超过 max_disk_bytes"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            self.metrics["evictions"] += 1
+
+    def invalidate(self, remote_fn: Any = None):
+        """清除某个远程函数（或全部，remote_fn 为 None 时）的内存层与磁盘层缓存"""
+        prefix = ""
+        if remote_fn is not None:
+            fn = remote_fn._function
+            prefix = f"{fn.__module__}.{fn.__qualname__}-"
+        for key in [k for k in self.entries if k.startswith(prefix)]:
+            self._evict(key)
+        if self.cache_dir is not None:
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix) and name.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = (
+            self.metrics["memory_hits"]
+            + self.metrics["disk_hits"]
+            + self.metrics["misses"]
+        )
+        hits = self.metrics["memory_hits"] + self.metrics["disk_hits"]
+        return {
+            **self.metrics,
+            "entries": len(self.entries),
+            "memory_bytes": self.memory_bytes,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+def demo_cache(matrix_size: int = 1000):
+    """同一参数重复调用 matrix_multiply / process_data_chunk，展示内存层与磁盘层命中"""
+    from ray_main import RayDistributedSystem
+
+    rng = np.random.default_rng(0)
+    A = rng.random((matrix_size, matrix_size))
+    B = rng.random((matrix_size, matrix_size))
+    data = rng.random(1000000)
+
+    for run in ["first", "after restart"]:
+        system = RayDistributedSystem()
+        try:
+            cache = TaskCache()
+            if run == "first":
+                # 第一轮从空的磁盘缓存开始
+                cache.invalidate()
+            cached_matmul = cache.wrap(matrix_multiply)
+            cached_process = cache.wrap(process_data_chunk)
+            # 重启后只运行一次，结果来自磁盘层
+            repeats = 1 if run == "after restart" else 2
+
+            start_time = time.time()
+            for _ in range(repeats):
+                ray.get(
+                    [cached_matmul.remote(A, B)]
+                    + [cached_process.remote(data, op) for op in ["sum", "max", "min"]]
+                )
+            logger.info(
+                f"[{run}] {time.time() - start_time:.2f}s, cache stats: {cache.stats()}"
+            )
+        finally:
+            system.shutdown()
+
+
+if __name__ == "__main__":
+    demo_cache()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+惰性数据流 API
+source(...).map(...).filter(...).reduce(...) 只构建执行计划，
+终止操作时把连续的逐元素阶段融合为每个分区一个远程任务，只物化最终结果
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import ray
+
+from ray_main import (
+    MemmapDataset,
+    RayDistributedSystem,
+    aggregate_array,
+    combine_chunk_results,
+    finalize_aggregate,
+    logger,
+    merge_aggregates_task,
+    reduce_chunk,
+    tree_reduce,
+)
+
+# 每个分区一个任务时默认的分区数为 CPU 数的倍数
+DEFAULT_PARTITIONS_PER_CPU = 2
+
+
+def _load_partition(partition: Any) -> np.ndarray:
+    """分区可以是已解析的数组，或 (MemmapDataset, start, length) 片段"""
+    if isinstance(partition, tuple):
+        dataset, start, length = partition
+        return dataset.open_range(start, length)
+    return partition
+
+
+def _apply_stages(array: np.ndarray, stages: Tuple[Tuple[str, Callable], ...]):
+    for kind, fn in stages:
+        if kind == "map":
+            array = fn(array)
+        else:
+            array = array[fn(array)]
+    return array
+
+
+@ray.remote
+def run_fused_partition(
+    partition: Any, stages: Tuple[Tuple[str, Callable], ...], operation: str
+) -> Any:
+    """
+    远程函数：在一个分区上依次执行融合后的 map/filter 阶段，再做分区内归约
+
+    operation 为 sum/max/min 时复用 process_data_chunk 的归约（reduce_chunk），
+    mean/aggregate 返回可合并的聚合部分状态，collect 返回处理后的数组。
+    """
+    array = _apply_stages(_load_partition(partition), stages)
+    if operation == "collect":
+        return np.asarray(array)
+    if operation in ("mean", "aggregate"):
+        return aggregate_array(array)
+    if array.size == 0:
+        # 空分区返回归约的单位元
+        return {"sum": 0.0, "max": float("-inf"), "min": float("inf")}[operation]
+    return reduce_chunk(array, operation)
+
+
+class Dataset:
+    """
+    惰性数据集：记录分区与逐元素阶段，终止操作（reduce/aggregate/collect/count）时执行
+
+    map 的函数接收并返回 ndarray（向量化逐元素变换），
+    filter 的函数接收 ndarray 并返回布尔掩码。
+    """
+
+    def __init__(
+        self, partitions: List[Any], stages: Tuple = (), description: str = ""
+    ):
+        self.partitions = partitions
+        self.stages = stages
+        self.description = description
+
+    def _with_stage(self, kind: str, fn: Callable) -> "Dataset":
+        return Dataset(self.partitions, self.stages + ((kind, fn),), self.description)
+
+    def map(self, fn: Callable[[np.ndarray], np.ndarray]) -> "Dataset":
+        return self._with_stage("map", fn)
+
+    def filter(self, predicate: Callable[[np.ndarray], np.ndarray]) -> "Dataset":
+        return self._with_stage("filter", predicate)
+
+    def explain(self, operation: str = "reduce") -> str:
+        """返回执行计划的文字描述"""
+        fused = " -> ".join(
+            f"{kind}({getattr(fn, '__name__', repr(fn))})" for kind, fn in self.stages
+        )
+        lines = [
+            f"source: {len(self.partitions)} partitions ({self.description})",
+            f"fused task x {len(self.partitions)}: [{fused or 'identity'}] -> "
+            f"{operation}",
+        ]
+        if operation != "collect":
+            lines.append("combine: tree_reduce")
+        return "\n".join(lines)
+
+    def _submit(self, operation: str) -> List[ray.ObjectRef]:
+        logger.info(f"Executing plan:\n{self.explain(operation)}")
+        return [
+            run_fused_partition.remote(partition, self.stages, operation)
+            for partition in self.partitions
+        ]
+
+    def reduce(self, operation: str = "sum", fan_in: int = 16) -> float:
+        """sum/mean/max/min 归约，分区结果在集群内树形合并"""
+        if operation == "mean":
+            return self.aggregate(fan_in)["mean"]
+        if operation not in ("sum", "max", "min"):
+            raise ValueError(f"Unknown operation: {operation}")
+        return tree_reduce(
+            self._submit(operation),
+            combine_chunk_results,
+            fan_in,
+            reducer_args=(operation,),
+        )
+
+    def aggregate(self, fan_in: int = 16) -> Dict[str, float]:
+        """一次执行得到 count/sum/mean/max/min/std"""
+        state = tree_reduce(self._submit("aggregate"), merge_aggregates_task, fan_in)
+        return finalize_aggregate(state)
+
+    def count(self) -> int:
+        return self.aggregate()["count"]
+
+    def collect(self) -> np.ndarray:
+        """物化所有分区处理后的数据"""
+        return np.concatenate(ray.get(self._submit("collect")))
+
+
+def source(data: np.ndarray, num_partitions: int = None) -> Dataset:
+    """由内存中的数组创建数据集，每个分区只 ray.put 一次"""
+    if num_partitions is None:
+        num_partitions = DEFAULT_PARTITIONS_PER_CPU * int(
+            ray.cluster_resources().get("CPU", 1)
+        )
+    data = np.asarray(data)
+    partitions = [ray.put(part) for part in np.array_split(data, num_partitions)]
+    return Dataset(partitions, description=f"ndarray {data.shape} {data.dtype}")
+
+
+def from_memmap(dataset: MemmapDataset, chunk_size: int) -> Dataset:
+    """由磁盘数据集创建数据集，每个分区是一个文件片段，由任务自行映射"""
+    partitions = [
+        (dataset, start, length) for start, length in dataset.ranges(chunk_size)
+    ]
+    return Dataset(partitions, description=f"memmap {dataset.path}")
+
+
+def demo_dataflow(data_size: int = 1000000):
+    """运行融合的惰性管道，并与本地 NumPy 计算的结果对比"""
+    system = RayDistributedSystem()
+    try:
+        data = np.random.random(data_size)
+
+        def scale(x):
+            return x * 2 + 1
+
+        def above_two(x):
+            return x > 2
+
+        start_time = time.time()
+        pipeline = source(data).map(scale).filter(above_two)
+        stats = pipeline.aggregate()
+        total = pipeline.reduce("sum")
+        elapsed = time.time() - start_time
+
+        expected = scale(data)
+        expected = expected[above_two(expected)]
+        logger.info(f"Fused pipeline: {stats} in {elapsed:.2f}s")
+        logger.info(
+            f"Results match: {np.isclose(total, expected.sum())} "
+            f"{stats['count'] == expected.size}"
+        )
+    finally:
+        system.shutdown()
+
+
+if __name__ == "__main__":
+    demo_dataflow()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+可互换的执行后端
+同一组远程函数（compute_pi_chunk、matrix_multiply、process_data_chunk 等）
+可以在 Ray、本机进程池（ndarray 通过共享内存传递）或当前进程中串行执行；
+小问题不必为启动 Ray 集群付出比计算本身更多的时间
+"""
+
+import importlib
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import ray
+
+# 可选的后端
+BACKENDS = ("serial", "process", "ray")
+# 估计串行耗时低于该值（秒）时自动选择 serial，并行的调度开销不值得
+SERIAL_MAX_WORK_SECONDS = 0.05
+# 启动本地 Ray 集群的大致耗时（秒）；Ray 未初始化时，估计耗时低于
+# 该值的若干倍时自动选择 process
+RAY_STARTUP_SECONDS = 5.0
+RAY_MIN_WORK_RATIO = 4.0
+# 进程池中不小于该大小的 ndarray 参数通过共享内存传递，更小的直接 pickle
+SHARED_MIN_BYTES = 1 << 20
+# 单核串行执行时各内核的大致吞吐，用于按问题规模估计耗时
+KERNEL_RATES = {
+    "pi": 3e6,  # compute_pi_chunk 每秒样本数（逐点 Python 循环）
+    "matmul": 2e10,  # matrix_multiply 每秒浮点运算数
+    "reduce": 4e8,  # process_data_chunk 每秒数据点数
+}
+
+
+def estimate_work_seconds(kernel: str, size: float) -> float:
+    """
+    按问题规模估计串行耗时（秒）
+
+    Args:
+        kernel: KERNEL_RATES 中的内核名
+        size: pi 为总样本数，matmul 为浮点运算数（2 * n * k * m），reduce 为数据点数
+    """
+    return size / KERNEL_RATES[kernel]
+
+
+def select_backend(work_seconds: float) -> str:
+    """
+    按问题规模选择后端
+
+    Args:
+        work_seconds: 串行执行的估计耗时（秒）
+    """
+    if work_seconds < SERIAL_MAX_WORK_SECONDS:
+        return "serial"
+    if ray.is_initialized():
+        # 集群已经在运行，不再有启动开销
+        return "ray"
+    if work_seconds < RAY_MIN_WORK_RATIO * RAY_STARTUP_SECONDS:
+        return "process"
+    return "ray"
+
+
+class SharedArray:
+    """共享内存中 ndarray 的描述，传给进程池中的任务后在子进程中映射为数组"""
+
+    __slots__ = ("name", "shape", "dtype")
+
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+
+def _resolve_kernel(module: str, name: str) -> Any:
+    """按模块名和函数名找到远程函数的原函数（远程函数对象本身不能在进程间传递）"""
+    kernel = getattr(importlib.import_module(module), name)
+    return getattr(kernel, "_function", kernel)
+
+
+def _run_kernel(module: str, name: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """进程池中的入口：把 SharedArray 参数映射为数组后调用原函数"""
+    blocks = []
+
+    def attach(value):
+        if isinstance(value, SharedArray):
+            shm = SharedMemory(value.name)
+            blocks.append(shm)
+            return np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)
+        return value
+
+    try:
+        args = tuple(attach(a) for a in args)
+        kwargs = {k: attach(v) for k, v in kwargs.items()}
+        # 结果会被 pickle 回主进程，不能是共享内存的视图
+        return _resolve_kernel(module, name)(*args, **kwargs)
+    finally:
+        del args, kwargs
+        for shm in blocks:
+            shm.close()
+
+
+class Executor(ABC):
+    """
+    执行后端的公共接口
+
+    submit(remote_fn, *args) 返回 concurrent.futures.Future，
+    put(array) 对应 ray.put：同一个大数组传给多个任务时只传递一次。
+    """
+
+    name = "base"
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or os.cpu_count()
+
+    def put(self, value: Any) -> Any:
+        return value
+
+    @abstractmethod
+    def submit(self, remote_fn: Any, *args, **kwargs) -> Future:
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class SerialExecutor(Executor):
+    """在当前进程中依次执行，没有任何启动和调度开销"""
+
+    name = "serial"
+
+    def __init__(self, max_workers: int = None):
+        super().__init__(1)
+
+    def submit(self, remote_fn: Any, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(remote_fn._function(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class ProcessExecutor(Executor):
+    """
+    本机进程池（spawn 启动，不继承 Ray 等后台线程的状态）
+
+    不小于 SHARED_MIN_BYTES 的 ndarray 参数复制到共享内存，子进程直接映射，
+    不经过 pickle；put() 的数组在 shutdown 时释放，submit 自动共享的数组在任务完成后释放。
+    """
+
+    name = "process"
+
+    def __init__(self, max_workers: int = None):
+        super().__init__(max_workers)
+        self.pool = ProcessPoolExecutor(
+            self.max_workers, mp_context=get_context("spawn")
+        )
+        self.blocks: Dict[str, SharedMemory] = {}
+
+    def put(self, value: Any) -> Any:
+        if not isinstance(value, np.ndarray):
+            return value
+        shm = SharedMemory(create=True, size=max(1, value.nbytes))
+        np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+        self.blocks[shm.name] = shm
+        return SharedArray(shm.name, value.shape, value.dtype.str)
+
+    def release(self, handle: SharedArray):
+        shm = self.blocks.pop(handle.name, None)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def submit(self, remote_fn: Any, *args, **kwargs) -> Future:
+        temporary = []
+
+        def share(value):
+            if isinstance(value, np.ndarray) and value.nbytes >= SHARED_MIN_BYTES:
+                handle = self.put(value)
+                temporary.append(handle)
+                return handle
+            return value
+
+        args = tuple(share(a) for a in args)
+        kwargs = {k: share(v) for k, v in kwargs.items()}
+        fn = remote_fn._function
+        future = self.pool.submit(
+            _run_kernel, fn.__module__, fn.__qualname__, args, kwargs
+        )
+        for handle in temporary:
+            future.add_done_callback(lambda _, h=handle: self.release(h))
+        return future
+
+    def shutdown(self):
+        self.pool.shutdown()
+        while self.blocks:
+            _, shm = self.blocks.popitem()
+            shm.close()
+            shm.unlink()
+
+
+class RayExecutor(Executor):
+    """在当前连接的 Ray 集群上执行"""
+
+    name = "ray"
+
+    def __init__(self, max_workers: int = None):
+        super().__init__(max_workers or int(ray.cluster_resources().get("CPU", 1)))
+
+    def put(self, value: Any) -> Any:
+        return ray.put(value)
+
+    def submit(self, remote_fn: Any, *args, **kwargs) -> Future:
+        return remote_fn.remote(*args, **kwargs).future()
+
+
+EXECUTORS = {
+    "serial": SerialExecutor,
+    "process": ProcessExecutor,
+    "ray": RayExecutor,
+}
+
+
+def benchmark_crossover(
+    sizes: Dict[str, List[int]] = None, num_cpus: int = None, repeats: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    各后端在不同问题规模下的耗时，找出每个规模下最快的后端
+
+    规模含义：pi 为总样本数，matmul 为方阵边长，reduce 为数据点数。
+
+    startup 为创建后端的耗时（Ray 为启动本地集群，进程池为启动并预热子进程），
+    cold = startup + 单次运行，适用于只运行一次的脚本；warm 为已启动后的中位数。
+    """
+    from ray_main import RayDistributedSystem, logger
+
+    sizes = sizes or {
+        "pi": [10000, 100000, 1000000, 10000000],
+        "matmul": [100, 300, 1000, 2000],
+        "reduce": [10000, 1000000, 10000000, 50000000],
+    }
+    records = []
+    for backend in BACKENDS:
+        start_time = time.time()
+        system = RayDistributedSystem(num_cpus=num_cpus, backend=backend)
+        # 每个子进程执行一次，计入启动开销
+        system.run_reduction(np.zeros(system.num_cpus), "sum")
+        startup = time.time() - start_time
+        try:
+            for kernel, kernel_sizes in sizes.items():
+                for size in kernel_sizes:
+                    if kernel == "pi":
+                        run = lambda: system.run_pi(
+                            system.num_cpus, size // system.num_cpus
+                        )
+                    elif kernel == "matmul":
+                        A, B = np.random.random((2, size, size))
+                        run = lambda: system.run_matmul(A, B)
+                    else:
+                        data = np.random.random(size)
+                        run = lambda: system.run_reduction(data, "sum")
+                    times = []
+                    for _ in range(repeats):
+                        run_start = time.time()
+                        run()
+                        times.append(time.time() - run_start)
+                    records.append(
+                        {
+                            "backend": backend,
+                            "kernel": kernel,
+                            "size": size,
+                            "startup": startup,
+                            "warm": float(np.median(times)),
+                            "cold": startup + times[0],
+                        }
+                    )
+        finally:
+            system.shutdown()
+
+    logger.info(
+        f"{'kernel':<8} {'size':>10} "
+        + " ".join(f"{b + ' warm':>13}" for b in BACKENDS)
+        + f" {'warm winner':>12} {'cold winner':>12}"
+    )
+    for kernel, kernel_sizes in sizes.items():
+        for size in kernel_sizes:
+            rows = {
+                r["backend"]: r
+                for r in records
+                if r["kernel"] == kernel and r["size"] == size
+            }
+            warm_winner = min(rows, key=lambda b: rows[b]["warm"])
+            cold_winner = min(rows, key=lambda b: rows[b]["cold"])
+            logger.info(
+                f"{kernel:<8} {size:>10} "
+                + " ".join(f"{rows[b]['warm']:>12.4f}s" for b in BACKENDS)
+                + f" {warm_winner:>12} {cold_winner:>12}"
+            )
+    for backend in BACKENDS:
+        startup = next(r["startup"] for r in records if r["backend"] == backend)
+        logger.info(f"{backend} startup: {startup:.2f}s")
+    return records
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Executor backend crossover benchmark")
+    parser.add_argument("--num-cpus", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    benchmark_crossover(num_cpus=args.num_cpus, repeats=args.repeats)
+
+
+if __name__ == "__main__":
+    main()
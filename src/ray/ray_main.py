@@ -4,13 +4,45 @@ Ray 分布式计算示例程序
 演示 Ray 的基本功能：远程函数、Actor、分布式数据处理等
 """
 
-import ray
 import time
+
+# 记录导入 ray/numpy 的耗时，用于启动耗时报告
+_IMPORT_START = time.perf_counter()
+
+import ray
+import asyncio
+import contextlib
+import functools
 import numpy as np
 import logging
-from typing import List, Dict, Any
-import psutil
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Tuple
+import json
+import math
 import os
+import pickle
+import tempfile
+import threading
+import zlib
+from concurrent.futures import wait as wait_futures
+
+IMPORT_TIME = time.perf_counter() - _IMPORT_START
+
+from ray_executors import (
+    EXECUTORS,
+    Executor,
+    estimate_work_seconds,
+    select_backend,
+)
+from ray_metrics import (
+    ACTOR_QUEUE_DEPTH,
+    TASKS_COMPLETED,
+    TASKS_FAILED,
+    TASKS_IN_FLIGHT,
+    TASKS_SUBMITTED,
+    MetricsServer,
+    observe_call,
+    timed_get,
+)
 
 # 配置日志
 logging.basicConfig(
@@ -34,34 +66,737 @@ def compute_pi_chunk(n_samples: int) -> float:
     return 4.0 * count / n_samples
 
 
+# 向量化蒙特卡洛每个块的样本数：单块内存上限约为 2 * PI_BLOCK_SIZE * 8 字节
+PI_BLOCK_SIZE = 1 << 18
+
+
+@ray.remote
+def compute_pi_hits(
+    n_samples: int,
+    seed: np.random.SeedSequence = None,
+    block_size: int = PI_BLOCK_SIZE,
+) -> int:
+    """
+    远程函数：向量化的蒙特卡洛采样，返回落在单位圆内的点数
+
+    按 block_size 分块生成样本，内存占用与 n_samples 无关；
+    每个任务使用独立的 seed 构造 np.random.Generator，结果可复现。
+    """
+    rng = np.random.default_rng(seed)
+    block_size = max(1, min(block_size, n_samples))
+    # 复用同一块缓冲区，避免每块重新分配内存
+    buffer = np.empty(2 * block_size)
+    hits = 0
+    remaining = n_samples
+    while remaining > 0:
+        m = min(block_size, remaining)
+        block = buffer[: 2 * m].reshape(2, m)
+        rng.random(out=block)
+        np.square(block, out=block)
+        hits += int(np.count_nonzero(block[0] + block[1] <= 1.0))
+        remaining -= m
+    return hits
+
+
+def estimate_pi(
+    n_tasks: int,
+    samples_per_task: int,
+    engine: str = "vectorized",
+    seed: int = None,
+    block_size: int = PI_BLOCK_SIZE,
+    log_interval: float = 5.0,
+) -> Dict[str, Any]:
+    """
+    并行估算 π，engine 可选 "scalar"（逐点 Python 循环）或 "vectorized"（NumPy 分块）
+
+    两种引擎都先汇总命中数再计算 π，避免对各任务的比例再取平均带来的误差。
+    log_interval 传给 stream_tasks，None 时不输出进度。
+    """
+    if n_tasks <= 0:
+        raise ValueError(f"n_tasks must be positive, got {n_tasks}")
+    if samples_per_task <= 0:
+        raise ValueError(f"samples_per_task must be positive, got {samples_per_task}")
+    if engine == "scalar":
+        # compute_pi_chunk 返回 4 * hits / n，可以精确还原命中数
+        tasks = stream_tasks(
+            lambda _: compute_pi_chunk.remote(samples_per_task),
+            range(n_tasks),
+            log_interval=log_interval,
+            desc="pi/scalar",
+        )
+        to_hits = lambda r: round(r * samples_per_task / 4)
+    elif engine == "vectorized":
+        tasks = stream_tasks(
+            lambda s: compute_pi_hits.remote(samples_per_task, s, block_size),
+            np.random.SeedSequence(seed).spawn(n_tasks),
+            log_interval=log_interval,
+            desc="pi/vectorized",
+        )
+        to_hits = int
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    start_time = time.time()
+    hits = sum(to_hits(result) for _, result in tasks)
+    elapsed_time = time.time() - start_time
+
+    total_samples = n_tasks * samples_per_task
+    return {
+        "engine": engine,
+        "pi": 4.0 * hits / total_samples,
+        "hits": hits,
+        "samples": total_samples,
+        "elapsed_time": elapsed_time,
+        "samples_per_sec": total_samples / elapsed_time if elapsed_time > 0 else 0.0,
+    }
+
+
+# B 不超过该大小时整体共享给所有行块，否则同时按列分块
+MATMUL_SHARED_B_BYTES = 256 * 1024**2
+# 不超过该边长时与串行 np.dot 做完整比对
+MATMUL_VERIFY_LIMIT = 2000
+
+
 @ray.remote
 def matrix_multiply(A: np.ndarray, B: np.ndarray) -> np.ndarray:
     """
     远程函数：矩阵乘法
     """
-    logger.info(
-        f"Computing matrix multiplication on worker {ray.get_runtime_context().get_worker_id()}"
-    )
+    # 在进程池或串行后端中执行时 Ray 未初始化，不能调用 get_runtime_context（会启动 Ray）
+    if ray.is_initialized():
+        worker = ray.get_runtime_context().get_worker_id()
+    else:
+        worker = f"pid {os.getpid()}"
+    logger.info(f"Computing matrix multiplication on worker {worker}")
     return np.dot(A, B)
 
 
+# BLAS / OpenMP 读取的线程数环境变量
+BLAS_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def placement_options(cpus_per_task: int = 1) -> Dict[str, Any]:
+    """
+    CPU 密集任务的 .options 参数：声明每个任务占用的 CPU 数，
+    并把 worker 内 BLAS/OpenMP 的线程数限制为同样的值
+
+    BLAS 库只在加载时读取环境变量，因此通过 runtime_env 在 worker 启动时设置；
+    Ray 为不同的 runtime_env 启动独立的 worker，不会复用线程数不同的进程。
+    用法：matrix_multiply.options(**placement_options(2)).remote(A, B)
+    """
+    env_vars = {name: str(cpus_per_task) for name in BLAS_THREAD_ENV_VARS}
+    return {"num_cpus": cpus_per_task, "runtime_env": {"env_vars": env_vars}}
+
+
+def limit_blas_threads(num_threads: int) -> Any:
+    """运行时限制 BLAS 线程数（需要 threadpoolctl），未安装时返回空的上下文"""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=num_threads)
+
+
+def pin_process(cpu_set: List[int]) -> bool:
+    """
+    把当前进程的所有线程绑定到 cpu_set（仅 Linux）
+
+    BLAS 线程池在导入 numpy 时已经启动，只绑定当前线程不会影响它们，
+    因此逐个设置 /proc/self/task 下的线程。
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    for tid in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(tid), cpu_set)
+        except ProcessLookupError:
+            # 线程已退出
+            pass
+    return True
+
+
 @ray.remote
-def process_data_chunk(data: List[float], operation: str = "sum") -> float:
+class PinnedWorker:
     """
-    远程函数：处理数据块
+    绑定到固定 CPU 集合的 worker，在其上执行 CPU 密集的内核
+
+    BLAS 线程数与 cpu_set 大小一致，同一节点上各 worker 的 cpu_set 互不重叠。
     """
+
+    def __init__(self, cpu_set: List[int]):
+        self.cpu_set = cpu_set
+        self.pinned = pin_process(cpu_set)
+        # 保留对象使限制一直生效
+        self.thread_limit = limit_blas_threads(len(cpu_set))
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return fn(*args, **kwargs)
+
+    def get_placement(self) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "cpu_set": self.cpu_set, "pinned": self.pinned}
+
+
+class PinnedWorkerPool:
+    """
+    一组 PinnedWorker，把本机可用的 CPU 按 cpus_per_task 切分为互不重叠的集合
+
+    只适用于单节点集群（CPU 编号取自 driver 所在的机器）。
+    用法：pool.submit(matrix_multiply, A, B) 返回 ObjectRef，按轮询分配到各 worker。
+    """
+
+    def __init__(self, cpus_per_task: int = 1, num_workers: int = None):
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count()))
+        cluster_cpus = int(ray.cluster_resources().get("CPU", 1))
+        max_workers = max(1, min(len(cpus), cluster_cpus) // cpus_per_task)
+        num_workers = min(num_workers or max_workers, max_workers)
+
+        self.cpus_per_task = cpus_per_task
+        self.workers = [
+            PinnedWorker.options(**placement_options(cpus_per_task)).remote(
+                cpus[i * cpus_per_task : (i + 1) * cpus_per_task]
+            )
+            for i in range(num_workers)
+        ]
+        self.next_worker = 0
+
+    def submit(self, remote_fn: Any, *args, **kwargs) -> ray.ObjectRef:
+        """在下一个 worker 上执行远程函数的原函数"""
+        worker = self.workers[self.next_worker]
+        self.next_worker = (self.next_worker + 1) % len(self.workers)
+        return worker.run.remote(remote_fn._function, *args, **kwargs)
+
+    def get_placement(self) -> List[Dict[str, Any]]:
+        return ray.get([w.get_placement.remote() for w in self.workers])
+
+    def shutdown(self):
+        for worker in self.workers:
+            ray.kill(worker)
+        self.workers = []
+
+
+def reduce_chunk(data: np.ndarray, operation: str = "sum") -> float:
+    """对数据块做 sum/mean/max/min 归约（向量化，列表和数组均可）"""
+    data = np.asarray(data, dtype=np.float64)
     if operation == "sum":
-        return sum(data)
+        return float(data.sum())
     elif operation == "mean":
-        return sum(data) / len(data)
+        return float(data.mean())
     elif operation == "max":
-        return max(data)
+        return float(data.max())
     elif operation == "min":
-        return min(data)
+        return float(data.min())
     else:
         raise ValueError(f"Unknown operation: {operation}")
 
 
+@ray.remote
+def process_data_chunk(data: List[float], operation: str = "sum") -> float:
+    """
+    远程函数：处理数据块
+    """
+    return reduce_chunk(data, operation)
+
+
+# 聚合内核每次处理的元素数，使一个块的数据在计算各统计量时保持在缓存中
+AGGREGATE_BLOCK_SIZE = 1 << 16
+
+
+def empty_aggregate() -> Dict[str, float]:
+    """空数据的聚合部分状态，作为 merge_aggregates 的单位元"""
+    return {
+        "count": 0,
+        "sum": 0.0,
+        "sum_sq": 0.0,
+        "min": float("inf"),
+        "max": float("-inf"),
+    }
+
+
+def merge_aggregates(*partials: Dict[str, float]) -> Dict[str, float]:
+    """合并多个聚合部分状态，满足结合律，可以按任意顺序、分组合并"""
+    merged = empty_aggregate()
+    for partial in partials:
+        merged["count"] += partial["count"]
+        merged["sum"] += partial["sum"]
+        merged["sum_sq"] += partial["sum_sq"]
+        merged["min"] = min(merged["min"], partial["min"])
+        merged["max"] = max(merged["max"], partial["max"])
+    return merged
+
+
+def finalize_aggregate(state: Dict[str, float]) -> Dict[str, float]:
+    """由部分状态计算最终统计量（按总数计算均值，块大小不等时依然正确）"""
+    count = state["count"]
+    mean = state["sum"] / count if count else float("nan")
+    variance = (
+        max(0.0, state["sum_sq"] / count - mean * mean) if count else float("nan")
+    )
+    return {
+        "count": count,
+        "sum": state["sum"],
+        "mean": mean,
+        "max": state["max"],
+        "min": state["min"],
+        "std": variance**0.5,
+    }
+
+
+def aggregate_array(chunk: np.ndarray) -> Dict[str, float]:
+    """
+    一次遍历计算数组的 count/sum/sum_sq/min/max 部分状态
+
+    按 AGGREGATE_BLOCK_SIZE 分块转换为 float64，np.memmap 输入只会按块读入内存。
+    """
+    chunk = np.asarray(chunk).ravel()
+    state = empty_aggregate()
+    for i in range(0, chunk.size, AGGREGATE_BLOCK_SIZE):
+        block = np.asarray(chunk[i : i + AGGREGATE_BLOCK_SIZE], dtype=np.float64)
+        state["sum"] += float(block.sum())
+        state["sum_sq"] += float(np.dot(block, block))
+        state["min"] = min(state["min"], float(block.min()))
+        state["max"] = max(state["max"], float(block.max()))
+    state["count"] = int(chunk.size)
+    return state
+
+
+@ray.remote
+def aggregate_chunk(chunk: np.ndarray) -> Dict[str, float]:
+    """
+    远程函数：一次遍历计算数据块的 count/sum/sum_sq/min/max 部分状态
+
+    结果可以用 merge_aggregates 合并，替代对同一数据块多次调用 process_data_chunk。
+    """
+    return aggregate_array(chunk)
+
+
+class MemmapDataset:
+    """
+    基于 np.memmap 的磁盘数据集
+
+    支持 .npy 文件（dtype 和数据偏移从文件头读取）和无文件头的原始二进制文件
+    （需要指定 dtype）。对象本身只保存路径和元信息，可以直接传给远程任务；
+    每个任务按 (start, length) 自行映射所需的片段，数据不经过 driver 和对象存储。
+    """
+
+    def __init__(self, path: str, dtype: Any = None, offset: int = 0):
+        self.path = os.path.abspath(path)
+        if path.endswith(".npy"):
+            header = np.load(self.path, mmap_mode="r")
+            self.dtype = header.dtype
+            self.offset = header.offset
+            self.length = header.size
+            del header
+        else:
+            if dtype is None:
+                raise ValueError("dtype is required for raw binary files")
+            self.dtype = np.dtype(dtype)
+            self.offset = offset
+            self.length = (os.path.getsize(self.path) - offset) // self.dtype.itemsize
+
+    def ranges(self, chunk_size: int) -> List[Tuple[int, int]]:
+        """按 chunk_size 个元素切分为 (start, length) 列表"""
+        return [
+            (start, min(chunk_size, self.length - start))
+            for start in range(0, self.length, chunk_size)
+        ]
+
+    def open_range(self, start: int, length: int) -> np.memmap:
+        """只读映射 [start, start + length) 范围内的元素"""
+        return np.memmap(
+            self.path,
+            dtype=self.dtype,
+            mode="r",
+            offset=self.offset + start * self.dtype.itemsize,
+            shape=(length,),
+        )
+
+
+def write_random_npy(
+    path: str, n_points: int, dtype: Any = np.float64, block_size: int = 1 << 22
+) -> MemmapDataset:
+    """按块写入 n_points 个随机数到 .npy 文件，生成比内存大的数据集时内存占用恒定"""
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_points,))
+    rng = np.random.default_rng()
+    for start in range(0, n_points, block_size):
+        stop = min(start + block_size, n_points)
+        array[start:stop] = rng.random(stop - start)
+    array.flush()
+    del array
+    return MemmapDataset(path)
+
+
+@ray.remote
+def aggregate_memmap_range(
+    dataset: MemmapDataset, start: int, length: int
+) -> Dict[str, float]:
+    """远程函数：映射数据集的一个片段并计算聚合部分状态"""
+    return aggregate_array(dataset.open_range(start, length))
+
+
+@ray.remote
+def merge_aggregates_task(*partials: Dict[str, float]) -> Dict[str, float]:
+    """远程函数：合并一组聚合部分状态，供 tree_reduce 使用"""
+    return merge_aggregates(*partials)
+
+
+@ray.remote
+def combine_chunk_results(operation: str, *values: float) -> float:
+    """
+    远程函数：合并一组 process_data_chunk 的结果，供 tree_reduce 使用
+
+    mean 无法仅凭各块均值合并（缺少元素个数），需要使用 aggregate_chunk。
+    """
+    if operation == "sum":
+        return sum(values)
+    elif operation == "max":
+        return max(values)
+    elif operation == "min":
+        return min(values)
+    else:
+        raise ValueError(f"Operation is not mergeable: {operation}")
+
+
+def stream_tasks(
+    submit: Callable[[Any], ray.ObjectRef],
+    items: Iterable[Any],
+    max_in_flight: int = None,
+    log_interval: float = 5.0,
+    desc: str = "tasks",
+    max_retries: int = 0,
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    流式执行任务：按完成顺序逐个产出 (item, result)
+
+    通过 ray.wait 获取已完成的任务，慢任务不会阻塞已完成结果的处理；
+    同时在途的任务数不超过 max_in_flight，items 可以是惰性生成器，
+    提交海量任务时不会一次性塞满调度器。
+
+    Args:
+        submit: 提交单个任务的函数，返回 ObjectRef
+        items: 待处理的条目
+        max_in_flight: 最大在途任务数，默认为集群 CPU 数的 2 倍
+        log_interval: 进度与吞吐量日志的间隔（秒），None 表示不输出
+        desc: 日志中的任务描述
+        max_retries: 整个执行过程中失败任务的重新提交次数上限（重试预算），
+            用完后再失败则抛出异常；Ray 自身对 worker 崩溃的重试在此之前进行
+    """
+    if max_in_flight is None:
+        max_in_flight = 2 * int(ray.cluster_resources().get("CPU", 1))
+    total = len(items) if hasattr(items, "__len__") else None
+    pending = {}
+    source = iter(items)
+    exhausted = False
+    completed = 0
+    start_time = last_log = time.time()
+
+    while True:
+        # 补充任务直到达到在途上限
+        while not exhausted and len(pending) < max_in_flight:
+            try:
+                item = next(source)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[submit(item)] = item
+            TASKS_SUBMITTED.inc(desc)
+        TASKS_IN_FLIGHT.set(len(pending), desc)
+        if not pending:
+            break
+
+        ready, _ = ray.wait(list(pending), num_returns=1)
+        for ref in ready:
+            item = pending.pop(ref)
+            try:
+                result = ray.get(ref)
+            except ray.exceptions.RayError as e:
+                TASKS_FAILED.inc(desc)
+                if max_retries <= 0:
+                    TASKS_IN_FLIGHT.set(len(pending), desc)
+                    raise
+                max_retries -= 1
+                logger.warning(
+                    f"[{desc}] task failed, resubmitting "
+                    f"({max_retries} retries left): {e}"
+                )
+                pending[submit(item)] = item
+                TASKS_SUBMITTED.inc(desc)
+                continue
+            completed += 1
+            TASKS_COMPLETED.inc(desc)
+            yield item, result
+
+        now = time.time()
+        if log_interval is not None and now - last_log >= log_interval:
+            last_log = now
+            progress = f"{completed}/{total}" if total is not None else f"{completed}"
+            logger.info(
+                f"[{desc}] {progress} done, {len(pending)} in flight, "
+                f"{completed / (now - start_time):.1f} tasks/s"
+            )
+
+    if log_interval is not None and completed:
+        elapsed = time.time() - start_time
+        logger.info(
+            f"[{desc}] {completed} done in {elapsed:.2f}s, "
+            f"{completed / elapsed if elapsed > 0 else 0.0:.1f} tasks/s"
+        )
+
+
+class PartitionCheckpoint:
+    """
+    分区结果的本地磁盘检查点
+
+    directory 下每个已完成分区一个 pickle 文件（先写临时文件再 os.replace，
+    中途崩溃不会留下不完整的检查点），manifest.json 记录数据与分块布局；
+    布局与已有检查点不一致时，旧的分区结果会被清除。
+    全部分区完成后 finish 保存最终结果并删除分区文件，重启时可以直接读取。
+    """
+
+    MANIFEST = "manifest.json"
+    RESULT = "result.pkl"
+
+    def __init__(self, directory: str, layout: Dict[str, Any]):
+        self.directory = directory
+        self.layout = layout
+        os.makedirs(directory, exist_ok=True)
+        if self.read_manifest(directory) != layout:
+            self.clear()
+            self._write(self.MANIFEST, json.dumps(layout).encode())
+
+    @classmethod
+    def read_manifest(cls, directory: str) -> Dict[str, Any]:
+        """读取已有检查点的布局，不存在时返回 None"""
+        try:
+            with open(os.path.join(directory, cls.MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name: str, payload: bytes):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _partition_file(self, index: int) -> str:
+        return f"part-{index:06d}.pkl"
+
+    def completed(self) -> List[int]:
+        """已有检查点的分区编号"""
+        return sorted(
+            int(name[5:-4])
+            for name in os.listdir(self.directory)
+            if name.startswith("part-") and name.endswith(".pkl")
+        )
+
+    def save(self, index: int, result: Any):
+        self._write(self._partition_file(index), pickle.dumps(result, protocol=5))
+
+    def load(self, index: int) -> Any:
+        with open(os.path.join(self.directory, self._partition_file(index)), "rb") as f:
+            return pickle.load(f)
+
+    def finish(self, result: Any):
+        """保存最终结果，之后不再需要分区结果"""
+        self._write(self.RESULT, pickle.dumps(result, protocol=5))
+        for index in self.completed():
+            os.remove(os.path.join(self.directory, self._partition_file(index)))
+
+    def final_result(self) -> Any:
+        """finish 保存的最终结果，尚未完成时返回 None"""
+        try:
+            with open(os.path.join(self.directory, self.RESULT), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def clear(self):
+        """删除所有分区结果、最终结果和 manifest"""
+        for name in os.listdir(self.directory):
+            if (
+                name.startswith("part-")
+                or name.startswith(self.MANIFEST)
+                or name.startswith(self.RESULT)
+            ):
+                os.remove(os.path.join(self.directory, name))
+
+
+def checkpointed_tasks(
+    submit: Callable[[Any], ray.ObjectRef],
+    items: List[Any],
+    checkpoint: PartitionCheckpoint,
+    **stream_kwargs,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    带检查点的 stream_tasks：产出 (分区编号, 结果)
+
+    先产出已有检查点的分区，再只为缺失的分区提交任务，每完成一个立即写入检查点；
+    重启后以同样的 items 和检查点调用即可从中断处继续。
+    stream_kwargs 透传给 stream_tasks（如 max_retries、desc）。
+    """
+    done = set(checkpoint.completed())
+    if done:
+        logger.info(
+            f"Resuming from {checkpoint.directory}: "
+            f"{len(done)}/{len(items)} partitions already done"
+        )
+    for index in sorted(done):
+        yield index, checkpoint.load(index)
+
+    missing = [index for index in range(len(items)) if index not in done]
+    for index, result in stream_tasks(
+        lambda index: submit(items[index]), missing, **stream_kwargs
+    ):
+        checkpoint.save(index, result)
+        yield index, result
+
+
+def tree_reduce(
+    refs: List[ray.ObjectRef],
+    reducer: Any,
+    fan_in: int = 16,
+    reducer_args: tuple = (),
+) -> Any:
+    """
+    按 fan_in 叉树在集群内逐层合并部分结果，driver 只获取最终的一个值
+
+    Args:
+        refs: 部分结果的对象引用
+        reducer: 远程函数，以 reducer.remote(*reducer_args, *group) 方式调用，
+            合并一组部分结果并返回同类型的部分结果
+        fan_in: 每个合并任务的输入个数
+        reducer_args: 放在每组部分结果之前传给 reducer 的参数
+
+    Returns:
+        合并后的最终结果
+    """
+    if not refs:
+        raise ValueError("tree_reduce requires at least one input")
+    if fan_in < 2:
+        raise ValueError(f"fan_in must be at least 2, got {fan_in}")
+
+    level = list(refs)
+    while len(level) > 1:
+        level = [
+            reducer.remote(*reducer_args, *level[i : i + fan_in])
+            for i in range(0, len(level), fan_in)
+        ]
+    return ray.get(level[0])
+
+
+class AdaptivePartitioner:
+    """
+    自适应分块器
+
+    用探测任务估计单任务固定开销 overhead（秒）和处理速率 throughput（元素/秒），
+    按模型 task_time(n) = overhead + n / throughput 选择分块：
+      - 开销占比不超过 max_overhead_ratio，即 n >= overhead * (1 - r) / r * throughput
+      - 分块数不少于 min_waves * num_cpus，保证所有 CPU 都有任务且尾部较均衡
+    数据量太小、两个条件冲突时优先控制开销。每轮运行后调用 observe，
+    根据实际耗时更新 throughput，下一轮的 plan 随之调整。
+    """
+
+    def __init__(
+        self,
+        num_cpus: int,
+        max_overhead_ratio: float = 0.05,
+        min_waves: int = 2,
+        smoothing: float = 0.5,
+    ):
+        self.num_cpus = num_cpus
+        self.max_overhead_ratio = max_overhead_ratio
+        self.min_waves = min_waves
+        self.smoothing = smoothing
+        self.overhead = None
+        self.throughput = None
+        self.plans = []
+
+    def probe(
+        self,
+        submit: Callable[[int], ray.ObjectRef],
+        probe_size: int,
+        repeats: int = 3,
+    ):
+        """
+        探测单任务开销与处理速率
+
+        Args:
+            submit: 提交处理 n 个元素的任务，返回 ObjectRef
+            probe_size: 测量处理速率时使用的元素个数
+            repeats: 每项测量的重复次数，取中位数
+        """
+
+        def measure(n: int) -> float:
+            timings = []
+            for _ in range(repeats):
+                start_time = time.time()
+                ray.get(submit(n))
+                timings.append(time.time() - start_time)
+            return float(np.median(timings))
+
+        self.overhead = measure(1)
+        self.throughput = probe_size / max(measure(probe_size) - self.overhead, 1e-6)
+        logger.info(
+            f"Probe: overhead={self.overhead * 1000:.2f}ms/task, "
+            f"throughput={self.throughput:,.0f} items/s"
+        )
+
+    def plan(self, total_size: int) -> Dict[str, Any]:
+        """为 total_size 个元素规划分块，返回的计划会记录在 self.plans 中"""
+        if self.overhead is None:
+            raise RuntimeError("probe() must be called before plan()")
+        r = self.max_overhead_ratio
+        min_chunk = math.ceil(self.overhead * (1 - r) / r * self.throughput)
+        balanced_chunk = math.ceil(total_size / (self.min_waves * self.num_cpus))
+        chunk_size = max(1, min(total_size, max(min_chunk, balanced_chunk)))
+        n_chunks = math.ceil(total_size / chunk_size)
+        # 在分块数不变的前提下均分，避免最后一块过小
+        chunk_size = math.ceil(total_size / n_chunks)
+        waves = math.ceil(n_chunks / self.num_cpus)
+        task_time = self.overhead + chunk_size / self.throughput
+
+        plan = {
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "n_chunks": n_chunks,
+            "num_cpus": self.num_cpus,
+            "waves": waves,
+            "overhead": self.overhead,
+            "throughput": self.throughput,
+            "est_task_time": task_time,
+            "est_overhead_ratio": self.overhead / task_time,
+            "est_time": waves * task_time,
+        }
+        self.plans.append(plan)
+        logger.info(
+            f"Partition plan: {n_chunks} chunks x {chunk_size} items, "
+            f"{waves} waves on {self.num_cpus} CPUs, "
+            f"est {plan['est_time']:.3f}s "
+            f"(overhead {plan['est_overhead_ratio']:.1%})"
+        )
+        return plan
+
+    def observe(self, plan: Dict[str, Any], elapsed: float):
+        """记录一轮按 plan 执行的实际耗时，并据此修正处理速率"""
+        plan["observed_time"] = elapsed
+        compute_time = elapsed / plan["waves"] - self.overhead
+        if compute_time > 0:
+            measured = plan["chunk_size"] / compute_time
+            self.throughput = (
+                self.smoothing * self.throughput + (1 - self.smoothing) * measured
+            )
+
+
 @ray.remote
 class DistributedCounter:
     """
@@ -96,74 +831,600 @@ class DistributedCounter:
         }
 
 
+class ShardedCounter:
+    """
+    分片计数器：把增量分散到多个 DistributedCounter Actor 上
+
+    按 key 的哈希选择分片，key 默认为调用方的 worker ID，
+    不同 worker 上的调用自然分散到不同分片。句柄可以传给远程任务使用。
+    """
+
+    def __init__(self, num_shards: int = 4, initial_value: int = 0):
+        self.shards = [
+            DistributedCounter.remote(initial_value if i == 0 else 0)
+            for i in range(num_shards)
+        ]
+
+    def shard_for(self, key: Any = None) -> int:
+        if key is None:
+            key = ray.get_runtime_context().get_worker_id()
+        return zlib.crc32(str(key).encode()) % len(self.shards)
+
+    def increment(self, delta: int = 1, key: Any = None) -> ray.ObjectRef:
+        """直接发送一次增量（一次 Actor 调用），返回该分片的新值的引用"""
+        return self.shards[self.shard_for(key)].increment.remote(delta)
+
+    def get_value(self) -> int:
+        """并行读取所有分片并求和，不包含客户端尚未发送的增量"""
+        return sum(ray.get([shard.get_value.remote() for shard in self.shards]))
+
+    def client(self, **kwargs) -> "BatchingCounterClient":
+        return BatchingCounterClient(self, **kwargs)
+
+
+class BatchingCounterClient:
+    """
+    分片计数器的客户端批处理包装
+
+    increment 只在本地累加，累计操作数达到 flush_size 或距上次发送超过
+    flush_interval 秒时，把每个分片的累计增量合并成一次 Actor 调用发送；
+    缓冲非空时有一个 flush_interval 后触发的定时器，停止写入后缓冲的增量也会发出。
+    在途的发送数超过 max_in_flight 时等待一半完成，形成背压。
+
+    用完后调用 close()（或用 with 语句）发送剩余增量并等待完成。
+    """
+
+    def __init__(
+        self,
+        counter: ShardedCounter,
+        flush_size: int = 1000,
+        flush_interval: float = 0.05,
+        max_in_flight: int = 64,
+        key: Any = None,
+    ):
+        self.counter = counter
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_in_flight = max_in_flight
+        self.default_shard = counter.shard_for(key)
+        self.pending = [0] * len(counter.shards)
+        self.pending_ops = 0
+        self.in_flight = []
+        self.last_flush = time.time()
+        # 定时器线程与调用方线程都会发送，缓冲区和在途列表由锁保护
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def __enter__(self) -> "BatchingCounterClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def increment(self, delta: int = 1, key: Any = None):
+        shard = self.default_shard if key is None else self.counter.shard_for(key)
+        with self.lock:
+            self.pending[shard] += delta
+            self.pending_ops += 1
+            if (
+                self.pending_ops >= self.flush_size
+                or time.time() - self.last_flush >= self.flush_interval
+            ):
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _flush_on_timer(self):
+        with self.lock:
+            self.timer = None
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for shard, delta in enumerate(self.pending):
+            if delta:
+                self.in_flight.append(
+                    self.counter.shards[shard].increment.remote(delta)
+                )
+                self.pending[shard] = 0
+        self.pending_ops = 0
+        self.last_flush = time.time()
+        if len(self.in_flight) > self.max_in_flight:
+            _, self.in_flight = ray.wait(
+                self.in_flight, num_returns=len(self.in_flight) // 2
+            )
+
+    def flush(self):
+        """发送本地累计的增量"""
+        with self.lock:
+            self._flush_locked()
+
+    def wait(self):
+        """发送本地缓冲并等待所有在途增量完成"""
+        with self.lock:
+            self._flush_locked()
+            in_flight, self.in_flight = self.in_flight, []
+        ray.get(in_flight)
+
+    def close(self):
+        """发送剩余增量并等待完成，之后不应再调用 increment"""
+        self.wait()
+
+    def get_value(self, consistency: str = "eventual") -> int:
+        """
+        读取计数器的值
+
+        Args:
+            consistency: "eventual" 直接读取各分片，不包含本地缓冲和在途的增量
+                （缓冲最多延迟 flush_interval 秒发送）；
+                "exact" 先发送本地缓冲并等待在途增量完成后再读取
+        """
+        if consistency == "exact":
+            self.wait()
+        elif consistency != "eventual":
+            raise ValueError(f"Unknown consistency: {consistency}")
+        return self.counter.get_value()
+
+
+@ray.remote
+def run_counter_load(
+    counter: ShardedCounter, n_increments: int, flush_size: int
+) -> int:
+    """远程函数：通过批处理客户端对计数器执行 n_increments 次加一"""
+    with counter.client(flush_size=flush_size) as client:
+        for _ in range(n_increments):
+            client.increment(1)
+    return n_increments
+
+
+# 每个 DataProcessor 保留的最近批次统计条数
+BATCH_HISTORY_SIZE = 1024
+
+BATCH_STATS_DTYPE = np.dtype(
+    [
+        ("batch_size", np.int64),
+        ("sum", np.float64),
+        ("processing_time", np.float64),
+    ]
+)
+
+
+class BatchStatsRing:
+    """
+    批次统计的环形缓冲区
+
+    使用预分配的结构化 NumPy 数组保存最近 capacity 个批次的统计，
+    长时间运行的 Actor 内存占用不会随批次数增长。
+    """
+
+    def __init__(self, capacity: int = BATCH_HISTORY_SIZE):
+        self.records = np.zeros(capacity, dtype=BATCH_STATS_DTYPE)
+        self.total = 0
+
+    def append(self, batch_size: int, batch_sum: float, processing_time: float):
+        self.records[self.total % len(self.records)] = (
+            batch_size,
+            batch_sum,
+            processing_time,
+        )
+        self.total += 1
+
+    def window(self) -> np.ndarray:
+        """最近批次的统计记录（无序）"""
+        return self.records[: min(self.total, len(self.records))]
+
+    def percentiles(
+        self, field: str = "processing_time", q: Tuple[int, ...] = (50, 95, 99)
+    ) -> Dict[str, float]:
+        """最近批次某个字段的滚动分位数"""
+        values = self.window()[field]
+        if values.size == 0:
+            return {f"p{p}": float("nan") for p in q}
+        return {f"p{p}": float(v) for p, v in zip(q, np.percentile(values, q))}
+
+
+def as_column(data_batch: Any) -> np.ndarray:
+    """
+    将一批数据转换为连续的 float64 数组
+
+    NumPy 数组和 Arrow 数组（通过 __array__ 协议）在类型匹配时不复制，
+    列表会复制一次。
+    """
+    return np.ascontiguousarray(data_batch, dtype=np.float64).ravel()
+
+
+def transform_column(column: np.ndarray, out: np.ndarray) -> float:
+    """模拟数据处理：向量化计算 x * 2 + 1，结果写入 out，返回结果之和"""
+    np.multiply(column, 2, out=out)
+    out += 1
+    return float(out.sum())
+
+
 @ray.remote
 class DataProcessor:
     """
     Ray Actor：数据处理器
     """
 
-    def __init__(self, processor_id: str):
+    def __init__(self, processor_id: str, history_size: int = BATCH_HISTORY_SIZE):
         self.processor_id = processor_id
         self.processed_count = 0
-        self.results = []
+        self.history = BatchStatsRing(history_size)
+        # 复用的工作缓冲区，避免每个批次重新分配内存
+        self.buffer = np.empty(0)
         logger.info(f"DataProcessor {processor_id} initialized")
 
-    def process_batch(self, data_batch: List[float]) -> Dict[str, Any]:
-        """处理一批数据"""
+    def process_batch(self, data_batch: np.ndarray) -> Dict[str, Any]:
+        """处理一批数据（NumPy 数组、Arrow 数组或列表）"""
         start_time = time.time()
 
-        # 模拟数据处理
-        processed_data = [x * 2 + 1 for x in data_batch]
+        column = as_column(data_batch)
+        n = column.size
+        if self.buffer.size < n:
+            self.buffer = np.empty(max(n, 2 * self.buffer.size))
+
+        # 模拟数据处理，结果原地写入工作缓冲区
+        total = transform_column(column, self.buffer[:n])
         result = {
             "processor_id": self.processor_id,
-            "batch_size": len(data_batch),
-            "sum": sum(processed_data),
-            "mean": sum(processed_data) / len(processed_data),
+            "batch_size": n,
+            "sum": total,
+            "mean": total / n if n else float("nan"),
             "processing_time": time.time() - start_time,
         }
 
-        self.processed_count += len(data_batch)
-        self.results.append(result)
+        self.processed_count += n
+        self.history.append(n, total, result["processing_time"])
 
         return result
 
     def get_stats(self) -> Dict[str, Any]:
-        """获取处理统计信息"""
+        """获取处理统计信息，包括最近批次处理时间的滚动分位数"""
         return {
             "processor_id": self.processor_id,
             "total_processed": self.processed_count,
-            "batches_processed": len(self.results),
+            "batches_processed": self.history.total,
+            "processing_time": self.history.percentiles("processing_time"),
             "worker_id": ray.get_runtime_context().get_worker_id(),
         }
 
 
+class DataProcessorPool:
+    """
+    动态 DataProcessor 池：每个批次发给当前排队最少且未排满的 Actor
+
+    每个 Actor 最多排队 max_queue 个批次，所有 Actor 都排满时等待任意一个完成后再分发，
+    慢 Actor 不会像轮询分配那样积压后续批次。
+    max_actors 大于 min_actors 时自动伸缩：所有 Actor 都排满且仍有批次等待时
+    新增 Actor，一轮 imap_unordered 结束后空闲的 Actor 回收到 min_actors 个。
+    """
+
+    def __init__(
+        self,
+        min_actors: int = 2,
+        max_actors: int = None,
+        max_queue: int = 2,
+        actor_cls: Any = DataProcessor,
+    ):
+        self.min_actors = min_actors
+        self.max_actors = max(max_actors or min_actors, min_actors)
+        self.max_queue = max_queue
+        self.actor_cls = actor_cls
+        # 指标中使用的 Actor 类名
+        self.actor_name = actor_cls.__ray_metadata__.class_name
+        self.actors = {}
+        self.queue_depth = {}
+        self.next_id = 0
+        for _ in range(min_actors):
+            self._add_actor()
+
+    def _add_actor(self) -> str:
+        processor_id = f"pool_processor_{self.next_id}"
+        self.next_id += 1
+        self.actors[processor_id] = self.actor_cls.remote(processor_id)
+        self.queue_depth[processor_id] = 0
+        return processor_id
+
+    def _pick_actor(self) -> str:
+        """选择排队最少且未排满的 Actor，必要时扩容，没有可用 Actor 时返回 None"""
+        processor_id = min(self.queue_depth, key=self.queue_depth.get)
+        if self.queue_depth[processor_id] < self.max_queue:
+            return processor_id
+        if len(self.actors) < self.max_actors:
+            return self._add_actor()
+        return None
+
+    def scale_down(self):
+        """回收空闲的 Actor，保留至少 min_actors 个"""
+        for processor_id, depth in list(self.queue_depth.items()):
+            if len(self.actors) <= self.min_actors:
+                break
+            if depth == 0:
+                ray.kill(self.actors.pop(processor_id))
+                del self.queue_depth[processor_id]
+                ACTOR_QUEUE_DEPTH.remove(processor_id)
+
+    def imap_unordered(self, batches: Iterable[Any]) -> Iterator[Tuple[int, Any]]:
+        """按完成顺序产出 (批次序号, process_batch 结果)"""
+        source = enumerate(batches)
+        waiting = next(source, None)
+        in_flight = {}
+
+        while waiting is not None or in_flight:
+            # 把等待的批次分发给空闲的 Actor
+            while waiting is not None:
+                processor_id = self._pick_actor()
+                if processor_id is None:
+                    break
+                index, batch = waiting
+                ref = self.actors[processor_id].process_batch.remote(batch)
+                in_flight[ref] = (index, processor_id, time.time())
+                self.queue_depth[processor_id] += 1
+                ACTOR_QUEUE_DEPTH.set(self.queue_depth[processor_id], processor_id)
+                waiting = next(source, None)
+
+            ready, _ = ray.wait(list(in_flight), num_returns=1)
+            for ref in ready:
+                index, processor_id, submit_time = in_flight.pop(ref)
+                observe_call(self.actor_name, "process_batch", submit_time)
+                self.queue_depth[processor_id] -= 1
+                ACTOR_QUEUE_DEPTH.set(self.queue_depth[processor_id], processor_id)
+                yield index, ray.get(ref)
+
+        self.scale_down()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return ray.get([actor.get_stats.remote() for actor in self.actors.values()])
+
+
+# 异步 Actor 默认的最大并发调用数，可通过 .options(max_concurrency=...) 调整
+ASYNC_ACTOR_MAX_CONCURRENCY = 16
+
+
+@ray.remote(max_concurrency=ASYNC_ACTOR_MAX_CONCURRENCY)
+class AsyncDistributedCounter:
+    """
+    Ray 异步 Actor：分布式计数器
+
+    方法在同一个事件循环中执行，读写之间没有 await，不需要加锁。
+    """
+
+    def __init__(self, initial_value: int = 0):
+        self.value = initial_value
+        self.worker_id = ray.get_runtime_context().get_worker_id()
+        logger.info(f"AsyncDistributedCounter initialized on worker {self.worker_id}")
+
+    async def increment(self, delta: int = 1) -> int:
+        self.value += delta
+        return self.value
+
+    async def decrement(self, delta: int = 1) -> int:
+        self.value -= delta
+        return self.value
+
+    async def get_value(self) -> int:
+        return self.value
+
+    async def reset(self) -> int:
+        self.value = 0
+        return self.value
+
+    async def get_worker_info(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "current_value": self.value,
+            "pid": os.getpid(),
+        }
+
+
+@ray.remote(max_concurrency=ASYNC_ACTOR_MAX_CONCURRENCY)
+class AsyncDataProcessor:
+    """
+    Ray 异步 Actor：数据处理器
+
+    批处理计算放到线程池执行（NumPy 计算期间释放 GIL），
+    事件循环可以在 process_batch 执行期间同时响应 get_stats。
+    """
+
+    def __init__(self, processor_id: str, history_size: int = BATCH_HISTORY_SIZE):
+        self.processor_id = processor_id
+        self.processed_count = 0
+        self.history = BatchStatsRing(history_size)
+        logger.info(f"AsyncDataProcessor {processor_id} initialized")
+
+    async def process_batch(self, data_batch: np.ndarray) -> Dict[str, Any]:
+        """处理一批数据（NumPy 数组、Arrow 数组或列表）"""
+        start_time = time.time()
+
+        column = as_column(data_batch)
+        n = column.size
+        # 并发的批次不能共享工作缓冲区，每个批次单独分配
+        total = await asyncio.get_running_loop().run_in_executor(
+            None, transform_column, column, np.empty(n)
+        )
+        result = {
+            "processor_id": self.processor_id,
+            "batch_size": n,
+            "sum": total,
+            "mean": total / n if n else float("nan"),
+            "processing_time": time.time() - start_time,
+        }
+
+        # 回到事件循环线程后再更新统计，不会与其他调用竞争
+        self.processed_count += n
+        self.history.append(n, total, result["processing_time"])
+
+        return result
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取处理统计信息，包括最近批次处理时间的滚动分位数"""
+        return {
+            "processor_id": self.processor_id,
+            "total_processed": self.processed_count,
+            "batches_processed": self.history.total,
+            "processing_time": self.history.percentiles("processing_time"),
+            "worker_id": ray.get_runtime_context().get_worker_id(),
+        }
+
+
+@ray.remote
+def prewarm_worker() -> int:
+    """远程函数：预热 worker 进程，提前完成 numpy 等模块的导入"""
+    import numpy  # noqa: F401
+
+    return os.getpid()
+
+
+def measure_startup(address: str = None, prewarm: bool = False) -> Dict[str, Any]:
+    """
+    测量从初始化到第一个任务完成的耗时
+
+    Returns:
+        mode 为 "warm"（复用已运行的集群）或 "cold"（启动新的本地集群），
+        以及模块导入、集群初始化、首个任务各阶段的耗时（秒）
+    """
+    start_time = time.time()
+    system = RayDistributedSystem(address=address, prewarm=prewarm)
+    init_time = time.time() - start_time
+
+    start_time = time.time()
+    ray.get(prewarm_worker.remote())
+    first_task_time = time.time() - start_time
+    report = {
+        "mode": "warm" if system.attached else "cold",
+        "import": IMPORT_TIME,
+        "init": init_time,
+        "first_task": first_task_time,
+        "total": IMPORT_TIME + init_time + first_task_time,
+    }
+    system.shutdown()
+    return report
+
+
+def startup_report(address: str = "auto") -> List[Dict[str, Any]]:
+    """
+    对比冷启动（启动本地集群）与热启动（连接已运行集群）的耗时
+
+    热启动需要先在本机执行 `ray start --head`，否则只报告冷启动。
+    """
+    reports = [measure_startup(address=None)]
+    warm = measure_startup(address=address)
+    if warm["mode"] == "warm":
+        reports.append(warm)
+    else:
+        logger.info("Run `ray start --head` first to measure warm startup")
+
+    for r in reports:
+        logger.info(
+            f"[{r['mode']}] import={r['import']:.2f}s init={r['init']:.2f}s "
+            f"first_task={r['first_task']:.2f}s total={r['total']:.2f}s"
+        )
+    return reports
+
+
+def requires_ray(method: Callable) -> Callable:
+    """标记只能在 Ray 后端上运行的 RayDistributedSystem 方法，其他后端调用时报错"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.backend != "ray":
+            raise RuntimeError(
+                f"{method.__name__}() requires the Ray backend, "
+                f"this system uses backend={self.backend!r}"
+            )
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class RayDistributedSystem:
     """
     Ray 分布式系统管理类
     """
 
-    def __init__(self, num_cpus: int = None, object_store_memory: int = None):
+    def __init__(
+        self,
+        num_cpus: int = None,
+        object_store_memory: int = None,
+        address: str = None,
+        prewarm: bool = False,
+        backend: str = "ray",
+    ):
         """
         初始化 Ray 集群
 
         Args:
-            num_cpus: CPU 核心数
-            object_store_memory: 对象存储内存大小（字节）
+            num_cpus: CPU 核心数（只在启动新的本地集群时生效）
+            object_store_memory: 对象存储内存大小（字节，只在启动新的本地集群时生效）
+            address: 已运行集群的地址，"auto" 表示本机通过 `ray start --head` 启动的集群；
+                连接成功时复用该集群，省去启动集群的时间，连接失败时启动新的本地集群
+            prewarm: 初始化后在每个 CPU 上预先启动 worker 并导入常用模块
+            backend: run_pi / run_matmul / run_reduction 使用的执行后端，见 ray_executors：
+                "ray"、"process"（本机进程池）、"serial"（当前进程），
+                后两者不启动 Ray，其余依赖 Ray 的方法会抛出 RuntimeError；
+                "auto" 在每次 run_* 调用时按问题规模估计串行耗时再选择，
+                选中 "ray" 时才启动集群
         """
-        self.num_cpus = num_cpus or psutil.cpu_count()
-        self.object_store_memory = object_store_memory or int(
-            psutil.virtual_memory().total * 0.3
-        )
-
-        # 初始化 Ray
-        if ray.is_initialized():
-            ray.shutdown()
-
-        ray.init(
-            num_cpus=self.num_cpus,
-            object_store_memory=self.object_store_memory,
-            ignore_reinit_error=True,
-        )
+        if backend != "auto" and backend not in EXECUTORS:
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        self.attached = False
+        # 本系统是否初始化了 Ray（shutdown 时只关闭自己初始化的连接）
+        self.ray_started = False
+        # 后端名 -> 执行器，按需创建
+        self.executors = {}
+        if backend != "ray":
+            self.num_cpus = num_cpus or os.cpu_count()
+            self.ray_options = (object_store_memory, address)
+            logger.info(f"Using {backend} backend with {self.num_cpus} CPUs")
+            return
+
+        self._start_ray(num_cpus, object_store_memory, address)
+        if prewarm:
+            self.prewarm()
+
+    def _start_ray(self, num_cpus: int, object_store_memory: int, address: str):
+        """连接已运行的集群或启动新的本地集群，并创建 Ray 执行器"""
+        if address is not None:
+            if ray.is_initialized():
+                self.attached = True
+            else:
+                try:
+                    ray.init(address=address)
+                    self.attached = True
+                except ConnectionError as e:
+                    logger.info(f"No running Ray cluster at {address!r}: {e}")
+
+        if self.attached:
+            resources = ray.cluster_resources()
+            self.num_cpus = int(resources.get("CPU", 1))
+            self.object_store_memory = int(resources.get("object_store_memory", 0))
+            logger.info(f"Attached to running Ray cluster at {address!r}")
+        else:
+            # psutil 只在启动本地集群时用到，延迟导入
+            import psutil
+
+            self.num_cpus = num_cpus or psutil.cpu_count()
+            self.object_store_memory = object_store_memory or int(
+                psutil.virtual_memory().total * 0.3
+            )
+
+            # 初始化 Ray
+            if ray.is_initialized():
+                ray.shutdown()
+
+            # address="local" 始终启动新的本地集群，即使本机已有运行中的集群
+            ray.init(
+                address="local",
+                num_cpus=self.num_cpus,
+                object_store_memory=self.object_store_memory,
+                ignore_reinit_error=True,
+            )
+        self.ray_started = True
 
         logger.info(f"Ray initialized with {self.num_cpus} CPUs")
         logger.info(
@@ -171,56 +1432,188 @@ class RayDistributedSystem:
         )
         logger.info(f"Ray cluster resources: {ray.cluster_resources()}")
 
-    def demo_remote_functions(self):
-        """演示远程函数的使用"""
-        logger.info("=== Remote Functions Demo ===")
-
-        # 1. 并行计算 π
-        logger.info("1. Computing π using Monte Carlo method...")
-        n_tasks = 8
-        samples_per_task = 1000000
+        self.executors["ray"] = EXECUTORS["ray"](self.num_cpus)
 
+    def _executor_for(self, kernel: str, size: float) -> Executor:
+        """
+        run_* 使用的执行器；backend="auto" 时按问题规模（见 estimate_work_seconds）
+        估计串行耗时后选择，首次选中某个后端时才创建它
+        """
+        backend = self.backend
+        if backend == "auto":
+            work_seconds = estimate_work_seconds(kernel, size)
+            backend = select_backend(work_seconds)
+            logger.debug(
+                f"Selected {backend!r} backend for ~{work_seconds:.3g}s of {kernel} work"
+            )
+        if backend not in self.executors:
+            if backend == "ray" and not ray.is_initialized():
+                # 按构造参数连接或启动集群
+                self._start_ray(self.num_cpus, *self.ray_options)
+            else:
+                # 已初始化的 Ray 由别处管理，直接在其上执行
+                self.executors[backend] = EXECUTORS[backend](self.num_cpus)
+        return self.executors[backend]
+
+    @requires_ray
+    def prewarm(self) -> List[int]:
+        """在每个 CPU 上各执行一个预热任务，启动 worker 进程并导入 numpy"""
         start_time = time.time()
-        # 创建远程任务
-        futures = [compute_pi_chunk.remote(samples_per_task) for _ in range(n_tasks)]
-        # 获取结果
-        results = ray.get(futures)
-        pi_estimate = sum(results) / len(results)
-        elapsed_time = time.time() - start_time
-
+        pids = ray.get([prewarm_worker.remote() for _ in range(self.num_cpus)])
         logger.info(
-            f"π estimate: {pi_estimate:.6f} (error: {abs(pi_estimate - np.pi):.6f})"
+            f"Prewarmed {len(set(pids))} workers in {time.time() - start_time:.2f}s"
         )
-        logger.info(f"Parallel computation time: {elapsed_time:.2f}s")
+        return pids
+
+    @requires_ray
+    def demo_remote_functions(
+        self,
+        pi_engines: List[str] = None,
+        seed: int = None,
+        matrix_size: int = 500,
+        tile_size: int = None,
+    ):
+        """
+        演示远程函数的使用
+
+        Args:
+            pi_engines: 要运行的 π 计算引擎，默认依次运行 "scalar" 和 "vectorized"
+            seed: 向量化引擎的随机种子，相同种子得到相同结果
+            matrix_size: 矩阵乘法演示中方阵的边长
+            tile_size: 矩阵乘法的分块边长，默认自动选择（见 blocked_matmul）
+        """
+        logger.info("=== Remote Functions Demo ===")
+
+        # 1. 并行计算 π
+        logger.info("1. Computing π using Monte Carlo method...")
+        total_samples = 8000000
+
+        for engine in pi_engines or ["scalar", "vectorized"]:
+            # 按引擎的实际开销和速率决定任务数与每个任务的样本数
+            kernel = compute_pi_chunk if engine == "scalar" else compute_pi_hits
+            partitioner = AdaptivePartitioner(self.num_cpus)
+            partitioner.probe(kernel.remote, probe_size=100000)
+            plan = partitioner.plan(total_samples)
+            n_tasks, samples_per_task = plan["n_chunks"], plan["chunk_size"]
+
+            stats = estimate_pi(n_tasks, samples_per_task, engine=engine, seed=seed)
+            pi_estimate = stats["pi"]
+            logger.info(
+                f"[{engine}] π estimate: {pi_estimate:.6f} "
+                f"(error: {abs(pi_estimate - np.pi):.6f})"
+            )
+            logger.info(
+                f"[{engine}] Parallel computation time: {stats['elapsed_time']:.2f}s, "
+                f"{stats['samples_per_sec']:,.0f} samples/s"
+            )
 
         # 2. 并行矩阵乘法
         logger.info("2. Parallel matrix multiplication...")
-        matrix_size = 500
         A = np.random.random((matrix_size, matrix_size))
         B = np.random.random((matrix_size, matrix_size))
 
-        # 将矩阵分块
-        chunk_size = matrix_size // 4
-        chunks_A = [A[i : i + chunk_size] for i in range(0, matrix_size, chunk_size)]
-
         start_time = time.time()
-        # 并行计算各个块
-        futures = [matrix_multiply.remote(chunk, B) for chunk in chunks_A]
-        results = ray.get(futures)
-        # 合并结果
-        C_parallel = np.vstack(results)
+        # 分块并行计算，B 只放入对象存储一次，结果直接写入预分配的输出矩阵
+        C_parallel = self.blocked_matmul(A, B, tile_size=tile_size)
         parallel_time = time.time() - start_time
+        logger.info(f"Parallel matrix multiplication time: {parallel_time:.2f}s")
 
-        # 串行计算对比
-        start_time = time.time()
-        C_serial = np.dot(A, B)
-        serial_time = time.time() - start_time
+        if matrix_size <= MATMUL_VERIFY_LIMIT:
+            # 串行计算对比
+            start_time = time.time()
+            C_serial = np.dot(A, B)
+            serial_time = time.time() - start_time
+
+            logger.info(f"Serial matrix multiplication time: {serial_time:.2f}s")
+            logger.info(f"Speedup: {serial_time/parallel_time:.2f}x")
+            logger.info(f"Results match: {np.allclose(C_parallel, C_serial)}")
+        else:
+            # 大矩阵只抽查部分行，避免串行计算整个矩阵
+            rows = np.random.choice(matrix_size, size=64, replace=False)
+            match = np.allclose(C_parallel[rows], np.dot(A[rows], B))
+            logger.info(f"Results match (64 sampled rows): {match}")
+
+    @requires_ray
+    def blocked_matmul(
+        self,
+        A: np.ndarray,
+        B: np.ndarray,
+        tile_size: int = None,
+        max_in_flight: int = None,
+        cpus_per_task: int = None,
+        pool: PinnedWorkerPool = None,
+        log_interval: float = 5.0,
+    ) -> np.ndarray:
+        """
+        分块分布式矩阵乘法 C = A @ B
 
-        logger.info(f"Parallel matrix multiplication time: {parallel_time:.2f}s")
-        logger.info(f"Serial matrix multiplication time: {serial_time:.2f}s")
-        logger.info(f"Speedup: {serial_time/parallel_time:.2f}x")
-        logger.info(f"Results match: {np.allclose(C_parallel, C_serial)}")
+        A 按行分块、B 按列分块，每个分块只 ray.put 一次，任务之间共享对象引用；
+        各输出块完成后直接写入预分配的 C，不需要 np.vstack 再复制一次。
 
+        Args:
+            A: 形状为 (n, k) 的矩阵
+            B: 形状为 (k, m) 的矩阵
+            tile_size: 输出块的边长；默认按 CPU 数切分 A 的行，
+                B 小于 MATMUL_SHARED_B_BYTES 时整体共享，否则按相同边长切分列
+            max_in_flight: 同时执行的最大任务数，限制对象存储中的中间结果，默认为可并发任务数的 2 倍
+            cpus_per_task: 每个任务声明的 CPU 数，同时限制 worker 内的 BLAS 线程数，
+                避免多个任务并发时线程数超过核数；None 时使用 Ray 的默认设置
+            pool: 在绑定 CPU 的 PinnedWorkerPool 上执行，优先于 cpus_per_task
+            log_interval: 进度日志的间隔（秒），None 时不输出进度
+
+        Returns:
+            形状为 (n, m) 的结果矩阵
+        """
+        n, k = A.shape
+        if B.shape[0] != k:
+            raise ValueError(f"Shape mismatch: {A.shape} @ {B.shape}")
+        m = B.shape[1]
+
+        if pool is not None:
+            submit = lambda a, b: pool.submit(matrix_multiply, a, b)
+            slots = len(pool.workers)
+        elif cpus_per_task is not None:
+            task = matrix_multiply.options(**placement_options(cpus_per_task))
+            submit = task.remote
+            slots = max(1, self.num_cpus // cpus_per_task)
+        else:
+            submit = matrix_multiply.remote
+            slots = self.num_cpus
+
+        if tile_size is None:
+            row_tile = max(1, -(-n // slots))
+            col_tile = m if B.nbytes <= MATMUL_SHARED_B_BYTES else row_tile
+        else:
+            row_tile = col_tile = tile_size
+        max_in_flight = max_in_flight or 2 * slots
+
+        C = np.empty((n, m), dtype=np.result_type(A, B))
+
+        # B 的列块在所有行块之间共享，只放入对象存储一次
+        col_blocks = []
+        for j in range(0, m, col_tile):
+            block = B if col_tile >= m else np.ascontiguousarray(B[:, j : j + col_tile])
+            col_blocks.append((j, ray.put(block)))
+
+        def tiles():
+            for i in range(0, n, row_tile):
+                # A 的行块在提交该行所有任务前放入对象存储，之后引用随任务释放
+                a_ref = ray.put(A[i : i + row_tile])
+                for j, b_ref in col_blocks:
+                    yield i, j, a_ref, b_ref
+
+        for (i, j, _, _), tile in stream_tasks(
+            lambda t: submit(t[2], t[3]),
+            tiles(),
+            max_in_flight=max_in_flight,
+            log_interval=log_interval,
+            desc="matmul",
+        ):
+            C[i : i + tile.shape[0], j : j + tile.shape[1]] = tile
+
+        return C
+
+    @requires_ray
     def demo_actors(self):
         """演示 Actor 的使用"""
         logger.info("=== Actors Demo ===")
@@ -230,95 +1623,610 @@ class RayDistributedSystem:
         counters = [DistributedCounter.remote(i * 10) for i in range(4)]
 
         # 并行操作计数器
+        submit_time = time.time()
         increment_futures = [counter.increment.remote(5) for counter in counters]
-        increment_results = ray.get(increment_futures)
+        increment_results = timed_get(
+            increment_futures, "DistributedCounter", "increment", submit_time
+        )
         logger.info(f"After increment: {increment_results}")
 
         # 获取计数器信息
+        submit_time = time.time()
         info_futures = [counter.get_worker_info.remote() for counter in counters]
-        info_results = ray.get(info_futures)
+        info_results = timed_get(
+            info_futures, "DistributedCounter", "get_worker_info", submit_time
+        )
         for info in info_results:
             logger.info(f"Counter info: {info}")
 
+        # 分片计数器：客户端本地合并增量后批量发送
+        sharded = ShardedCounter(num_shards=4)
+        with sharded.client(flush_size=100) as client:
+            for i in range(1000):
+                client.increment(1, key=i)
+            logger.info(
+                f"Sharded counter: eventual={client.get_value('eventual')}, "
+                f"exact={client.get_value('exact')}"
+            )
+
         # 2. 数据处理器
         logger.info("2. Data Processors...")
-        processors = [DataProcessor.remote(f"processor_{i}") for i in range(3)]
+        pool = DataProcessorPool(min_actors=3)
 
         # 生成测试数据
-        data = [list(np.random.random(100)) for _ in range(9)]
-
-        # 分发数据到不同的处理器
-        futures = []
-        for i, batch in enumerate(data):
-            processor = processors[i % len(processors)]
-            futures.append(processor.process_batch.remote(batch))
+        data = [np.random.random(100) for _ in range(9)]
 
-        # 获取处理结果
-        results = ray.get(futures)
-        for result in results:
+        # 批次发给最先空闲的处理器，按完成顺序处理结果
+        for _, result in pool.imap_unordered(data):
             logger.info(f"Batch result: {result}")
 
         # 获取处理器统计信息
-        stats_futures = [processor.get_stats.remote() for processor in processors]
-        stats_results = ray.get(stats_futures)
-        for stats in stats_results:
+        for stats in pool.get_stats():
             logger.info(f"Processor stats: {stats}")
 
-    def demo_data_processing_pipeline(self):
-        """演示数据处理管道"""
+    @requires_ray
+    def demo_data_processing_pipeline(
+        self,
+        data_size: int = 100000,
+        iterations: int = 1,
+        checkpoint_dir: str = None,
+        max_retries: int = 3,
+        seed: int = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        演示数据处理管道
+
+        Args:
+            data_size: 数据点数
+            iterations: 重复处理的轮数，每轮根据上一轮的耗时重新规划分块
+            checkpoint_dir: 分区结果的检查点目录；指定时中断后重新运行跳过已完成的轮次，
+                并且只计算未完成轮次中缺失的分区，所有轮次完成后删除检查点
+            max_retries: 每轮失败数据块的重新提交次数上限
+            seed: 生成数据的随机种子；使用检查点时默认为 0，保证重启后数据一致
+
+        Returns:
+            每一轮使用的分块计划及实际耗时
+        """
         logger.info("=== Data Processing Pipeline Demo ===")
 
         # 生成大数据集
-        data_size = 100000
-        chunk_size = 10000
-        data = list(np.random.random(data_size))
+        if checkpoint_dir is not None and seed is None:
+            seed = 0
+        data = np.random.default_rng(seed).random(data_size)
+
+        # 探测任务开销与处理速率，自适应选择分块大小
+        partitioner = AdaptivePartitioner(self.num_cpus)
+        partitioner.probe(
+            lambda n: aggregate_chunk.remote(data[:n]),
+            probe_size=min(data_size, 1 << 16),
+        )
 
-        # 将数据分块
-        chunks = [data[i : i + chunk_size] for i in range(0, data_size, chunk_size)]
-        logger.info(f"Processing {data_size} items in {len(chunks)} chunks")
+        checkpoints = []
+        for iteration in range(iterations):
+            plan = partitioner.plan(data_size)
+            chunk_size = plan["chunk_size"]
+
+            checkpoint = None
+            resumed = False
+            if checkpoint_dir is not None:
+                directory = os.path.join(checkpoint_dir, f"iteration_{iteration}")
+                previous = PartitionCheckpoint.read_manifest(directory)
+                if previous is not None and previous["data_size"] == data_size:
+                    # 沿用中断前的分块，已完成的分区才能复用
+                    chunk_size = previous["chunk_size"]
+                checkpoint = PartitionCheckpoint(
+                    directory,
+                    {"data_size": data_size, "seed": seed, "chunk_size": chunk_size},
+                )
+                checkpoints.append(checkpoint)
+                results = checkpoint.final_result()
+                if results is not None:
+                    # 中断前已完成的轮次直接使用保存的结果
+                    logger.info(f"Iteration {iteration} already completed, skipping")
+                    for operation in ["sum", "mean", "max", "min", "std"]:
+                        logger.info(f"{operation}: {results[operation]}")
+                    continue
+                resumed = bool(checkpoint.completed())
+
+            # 将数据分块（切片是视图，不会复制数据）
+            chunks = [data[i : i + chunk_size] for i in range(0, data_size, chunk_size)]
+            logger.info(f"Processing {data_size} items in {len(chunks)} chunks")
+
+            start_time = time.time()
+            # 每个数据块只提交一次，一次遍历得到所有统计量的部分状态；
+            # 部分状态完成一个合并一个，driver 只保留当前的合并结果
+            if checkpoint is None:
+                tasks = stream_tasks(
+                    aggregate_chunk.remote,
+                    chunks,
+                    desc="aggregate_chunk",
+                    max_retries=max_retries,
+                )
+            else:
+                tasks = checkpointed_tasks(
+                    aggregate_chunk.remote,
+                    chunks,
+                    checkpoint,
+                    desc="aggregate_chunk",
+                    max_retries=max_retries,
+                )
+            state = empty_aggregate()
+            for _, partial in tasks:
+                state = merge_aggregates(state, partial)
+            results = finalize_aggregate(state)
+            processing_time = time.time() - start_time
+            if not resumed and chunk_size == plan["chunk_size"]:
+                # 恢复的分区不计入耗时，沿用旧检查点分块的轮次与计划不符，
+                # 只用按计划完整执行的轮次修正处理速率
+                partitioner.observe(plan, processing_time)
+            if checkpoint is not None:
+                # 保留本轮结果，后续轮次中断时重启不必重新计算本轮
+                checkpoint.finish(results)
+
+            logger.info(f"Processing completed in {processing_time:.2f}s")
+            for operation in ["sum", "mean", "max", "min", "std"]:
+                logger.info(f"{operation}: {results[operation]}")
+
+        # 所有轮次都完成后才删除检查点
+        for checkpoint in checkpoints:
+            checkpoint.clear()
+
+        return partitioner.plans
+
+    @requires_ray
+    def demo_out_of_core_aggregation(
+        self, path: str = None, n_points: int = 50000000
+    ) -> Dict[str, float]:
+        """
+        演示对磁盘上的 .npy / 二进制文件做聚合，文件可以比内存大
 
-        # 并行处理不同操作
-        operations = ["sum", "mean", "max", "min"]
+        Args:
+            path: 数据文件路径；为 None 时在临时目录生成 n_points 个随机数的 .npy 文件
+            n_points: 生成数据文件时的数据点数
+        """
+        logger.info("=== Out-of-core Aggregation Demo ===")
+
+        if path is None:
+            path = os.path.join(tempfile.gettempdir(), f"ray_demo_{n_points}.npy")
+            if not os.path.exists(path):
+                logger.info(f"Writing {n_points} points to {path}")
+                write_random_npy(path, n_points)
+        dataset = MemmapDataset(path)
+        logger.info(
+            f"Dataset {dataset.path}: {dataset.length} x {dataset.dtype} "
+            f"({dataset.length * dataset.dtype.itemsize / 1024**3:.2f} GB)"
+        )
+
+        partitioner = AdaptivePartitioner(self.num_cpus)
+        partitioner.probe(
+            lambda n: aggregate_memmap_range.remote(dataset, 0, n),
+            probe_size=min(dataset.length, 1 << 20),
+        )
+        plan = partitioner.plan(dataset.length)
 
         start_time = time.time()
-        all_futures = []
+        # 任务只接收 (start, length)，各自映射文件片段
+        state = empty_aggregate()
+        for _, partial in stream_tasks(
+            lambda r: aggregate_memmap_range.remote(dataset, *r),
+            dataset.ranges(plan["chunk_size"]),
+            desc="aggregate_memmap_range",
+        ):
+            state = merge_aggregates(state, partial)
+        results = finalize_aggregate(state)
+        processing_time = time.time() - start_time
 
-        for operation in operations:
-            operation_futures = [
-                process_data_chunk.remote(chunk, operation) for chunk in chunks
-            ]
-            all_futures.extend(operation_futures)
+        logger.info(
+            f"Processing completed in {processing_time:.2f}s "
+            f"({dataset.length / processing_time:,.0f} points/s)"
+        )
+        for operation in ["count", "sum", "mean", "max", "min", "std"]:
+            logger.info(f"{operation}: {results[operation]}")
+        return results
+
+    @requires_ray
+    def benchmark_counters(
+        self,
+        n_increments: int = 20000,
+        shard_counts: Tuple[int, ...] = (1, 4),
+        n_clients: int = 4,
+        flush_size: int = 1000,
+    ) -> Dict[str, float]:
+        """
+        对比计数器的增量吞吐（次/秒）
+
+        - single_actor: 与 demo_actors 相同，每次增量都是一次 DistributedCounter 调用
+        - shards_N: n_clients 个远程任务通过批处理客户端写入 N 个分片
+        """
+        logger.info(
+            f"=== Counter Benchmark: {n_increments} increments, "
+            f"{n_clients} clients ==="
+        )
+        throughput = {}
+
+        counter = DistributedCounter.remote()
+        start_time = time.time()
+        ray.get([counter.increment.remote(1) for _ in range(n_increments)])
+        elapsed = time.time() - start_time
+        assert ray.get(counter.get_value.remote()) == n_increments
+        throughput["single_actor"] = n_increments / elapsed
+
+        per_client = n_increments // n_clients
+        for num_shards in shard_counts:
+            sharded = ShardedCounter(num_shards)
+            start_time = time.time()
+            ray.get(
+                [
+                    run_counter_load.remote(sharded, per_client, flush_size)
+                    for _ in range(n_clients)
+                ]
+            )
+            elapsed = time.time() - start_time
+            assert sharded.get_value() == per_client * n_clients
+            throughput[f"shards_{num_shards}"] = per_client * n_clients / elapsed
+
+        for name, rate in throughput.items():
+            logger.info(f"{name}: {rate:,.0f} increments/s")
+        return throughput
+
+    @requires_ray
+    def benchmark_actor_latency(
+        self,
+        n_rounds: int = 50,
+        writes_per_round: int = 4,
+        batch_size: int = 1000000,
+        max_concurrency: int = ASYNC_ACTOR_MAX_CONCURRENCY,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        对比同步与异步 Actor 在读写混合负载下的读延迟
+
+        每轮先提交 writes_per_round 个写调用，再发起一次读调用并等待其返回，
+        同步 Actor 的读请求需要排在已提交的写请求之后。
+        """
+        logger.info(
+            f"=== Actor Latency Benchmark: {n_rounds} rounds x "
+            f"{writes_per_round} writes, max_concurrency={max_concurrency} ==="
+        )
+        batch = np.random.random(batch_size)
+        batch_ref = ray.put(batch)
+        actors = {
+            "sync_processor": DataProcessor.remote("sync"),
+            "async_processor": AsyncDataProcessor.options(
+                max_concurrency=max_concurrency
+            ).remote("async"),
+            "sync_counter": DistributedCounter.remote(),
+            "async_counter": AsyncDistributedCounter.options(
+                max_concurrency=max_concurrency
+            ).remote(),
+        }
+        # 先完成一次调用，排除 Actor 启动时间
+        ray.get([actor.__ray_ready__.remote() for actor in actors.values()])
+
+        report = {}
+        for name, actor in actors.items():
+            if name.endswith("processor"):
+                write = lambda: actor.process_batch.remote(batch_ref)
+                read = actor.get_stats.remote
+            else:
+                write = lambda: actor.increment.remote(1)
+                read = actor.get_worker_info.remote
+
+            writes = []
+            read_latencies = []
+            start_time = time.time()
+            for _ in range(n_rounds):
+                writes.extend(write() for _ in range(writes_per_round))
+                read_start = time.time()
+                ray.get(read())
+                read_latencies.append(time.time() - read_start)
+            ray.get(writes)
+            elapsed = time.time() - start_time
+
+            p50, p95 = np.percentile(read_latencies, [50, 95])
+            report[name] = {
+                "read_p50_ms": p50 * 1000,
+                "read_p95_ms": p95 * 1000,
+                "writes_per_sec": len(writes) / elapsed,
+            }
+            logger.info(
+                f"{name}: read p50={p50 * 1000:.2f}ms p95={p95 * 1000:.2f}ms, "
+                f"{len(writes) / elapsed:.1f} writes/s"
+            )
+        return report
+
+    @requires_ray
+    def benchmark_actor_pool(
+        self, n_batches: int = 60, n_actors: int = 3, max_actors: int = None
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        在批次大小偏斜的负载下对比轮询分配与动态 Actor 池的完成时间分布
+
+        批次大小按重尾分布从 4 个量级中抽取，每种大小的数组只放入对象存储一次。
+        完成时间从统一起点计算，p95 与 max（总耗时）反映尾延迟。
+        """
+        logger.info(
+            f"=== Actor Pool Benchmark: {n_batches} skewed batches, "
+            f"{n_actors} actors ==="
+        )
+        sizes = [100000, 400000, 1600000, 6400000]
+        arrays = [ray.put(np.random.random(size)) for size in sizes]
+        choices = np.random.default_rng(0).choice(
+            len(sizes), size=n_batches, p=[0.55, 0.25, 0.15, 0.05]
+        )
+        batches = [arrays[c] for c in choices]
+
+        def summarize(name: str, done_times: List[float]) -> Dict[str, float]:
+            p50, p95 = np.percentile(done_times, [50, 95])
+            logger.info(
+                f"{name}: p50={p50:.2f}s p95={p95:.2f}s max={max(done_times):.2f}s"
+            )
+            return {"p50": p50, "p95": p95, "max": max(done_times)}
+
+        report = {}
+
+        processors = [DataProcessor.remote(f"processor_{i}") for i in range(n_actors)]
+        ray.get([p.__ray_ready__.remote() for p in processors])
+        start_time = time.time()
+        futures = [
+            processors[i % n_actors].process_batch.remote(batch)
+            for i, batch in enumerate(batches)
+        ]
+        done_times = []
+        while futures:
+            ready, futures = ray.wait(futures, num_returns=1)
+            done_times.append(time.time() - start_time)
+        report["round_robin"] = summarize("round_robin", done_times)
+
+        pool = DataProcessorPool(n_actors, max_actors=max_actors, max_queue=1)
+        ray.get([a.__ray_ready__.remote() for a in pool.actors.values()])
+        start_time = time.time()
+        done_times = [time.time() - start_time for _ in pool.imap_unordered(batches)]
+        report["pool"] = summarize("pool", done_times)
+        return report
+
+    @requires_ray
+    def benchmark_reduction(
+        self, n_chunks: int = 10000, chunk_size: int = 100, fan_in: int = 16
+    ) -> Dict[str, float]:
+        """
+        对比 driver 端扁平归约与集群内树形归约的耗时
+
+        - flat: process_data_chunk 计算 sum/max/min，ray.get 全部结果后在 driver 上归约
+        - tree: 同样的任务，用 combine_chunk_results 做树形归约
+        - tree_single_pass: aggregate_chunk + merge_aggregates_task 树形归约
+        """
+        logger.info(
+            f"=== Reduction Benchmark: {n_chunks} chunks x {chunk_size}, "
+            f"fan_in={fan_in} ==="
+        )
+        data = np.random.random(n_chunks * chunk_size)
+        # 预先放入对象存储，各方案不重复计入序列化开销
+        chunk_refs = [
+            ray.put(data[i : i + chunk_size]) for i in range(0, data.size, chunk_size)
+        ]
+        operations = ["sum", "max", "min"]
+        reducers = {"sum": sum, "max": max, "min": min}
+        timings = {}
 
-        # 获取所有结果
-        all_results = ray.get(all_futures)
+        start_time = time.time()
+        flat_results = {}
+        for operation in operations:
+            values = ray.get(
+                [process_data_chunk.remote(ref, operation) for ref in chunk_refs]
+            )
+            flat_results[operation] = reducers[operation](values)
+        timings["flat"] = time.time() - start_time
 
-        # 整理结果
-        results_by_operation = {}
-        idx = 0
+        start_time = time.time()
+        tree_results = {}
         for operation in operations:
-            operation_results = all_results[idx : idx + len(chunks)]
-            if operation in ["sum", "mean"]:
-                # 对于 sum 和 mean，需要重新计算总体结果
-                if operation == "sum":
-                    total_result = sum(operation_results)
-                else:  # mean
-                    total_result = sum(operation_results) / len(operation_results)
-            else:  # max, min
-                total_result = (
-                    max(operation_results)
-                    if operation == "max"
-                    else min(operation_results)
+            partials = [process_data_chunk.remote(ref, operation) for ref in chunk_refs]
+            tree_results[operation] = tree_reduce(
+                partials, combine_chunk_results, fan_in, reducer_args=(operation,)
+            )
+        timings["tree"] = time.time() - start_time
+
+        start_time = time.time()
+        partials = [aggregate_chunk.remote(ref) for ref in chunk_refs]
+        state = tree_reduce(partials, merge_aggregates_task, fan_in)
+        timings["tree_single_pass"] = time.time() - start_time
+
+        for name, elapsed in timings.items():
+            logger.info(f"{name}: {elapsed:.2f}s")
+        logger.info(
+            f"Results match: "
+            f"{np.isclose(flat_results['sum'], tree_results['sum'])} "
+            f"{np.isclose(flat_results['sum'], state['sum'])} "
+            f"{flat_results['max'] == tree_results['max'] == state['max']} "
+            f"{flat_results['min'] == tree_results['min'] == state['min']}"
+        )
+        return timings
+
+    @requires_ray
+    def benchmark_checkpointing(
+        self, data_size: int = 10000000, n_chunks: int = 200, repeats: int = 3
+    ) -> Dict[str, float]:
+        """
+        对比有无检查点时聚合管道的耗时（取 repeats 次中位数）
+
+        - plain: stream_tasks，不写检查点
+        - checkpointed: checkpointed_tasks，每个分区完成后写入检查点
+        - resume_half: 已有一半分区的检查点时，恢复执行剩余分区
+        """
+        logger.info(
+            f"=== Checkpointing Benchmark: {data_size} items in {n_chunks} chunks ==="
+        )
+        data = np.random.random(data_size)
+        chunk_size = math.ceil(data_size / n_chunks)
+        chunk_refs = [
+            ray.put(data[i : i + chunk_size]) for i in range(0, data_size, chunk_size)
+        ]
+        timings = {"plain": [], "checkpointed": [], "resume_half": []}
+        checkpoint_dir = tempfile.mkdtemp(prefix="ray_checkpoint_bench_")
+        layout = {"data_size": data_size, "chunk_size": chunk_size}
+
+        def run(tasks) -> Dict[str, float]:
+            state = empty_aggregate()
+            for _, partial in tasks:
+                state = merge_aggregates(state, partial)
+            return finalize_aggregate(state)
+
+        for _ in range(repeats):
+            start_time = time.time()
+            expected = run(
+                stream_tasks(aggregate_chunk.remote, chunk_refs, log_interval=None)
+            )
+            timings["plain"].append(time.time() - start_time)
+
+            checkpoint = PartitionCheckpoint(checkpoint_dir, layout)
+            start_time = time.time()
+            results = run(
+                checkpointed_tasks(
+                    aggregate_chunk.remote, chunk_refs, checkpoint, log_interval=None
                 )
+            )
+            timings["checkpointed"].append(time.time() - start_time)
 
-            results_by_operation[operation] = total_result
-            idx += len(chunks)
+            # 删除一半分区的检查点，模拟运行中途中断
+            for index in checkpoint.completed()[::2]:
+                os.remove(
+                    os.path.join(checkpoint_dir, checkpoint._partition_file(index))
+                )
+            start_time = time.time()
+            resumed = run(
+                checkpointed_tasks(
+                    aggregate_chunk.remote, chunk_refs, checkpoint, log_interval=None
+                )
+            )
+            timings["resume_half"].append(time.time() - start_time)
+            checkpoint.clear()
 
-        processing_time = time.time() - start_time
+        medians = {name: float(np.median(times)) for name, times in timings.items()}
+        for name, elapsed in medians.items():
+            logger.info(f"{name}: {elapsed:.3f}s")
+        logger.info(
+            f"Checkpointing overhead: "
+            f"{medians['checkpointed'] / medians['plain'] - 1:+.1%}"
+        )
+        logger.info(
+            f"Results match: {np.isclose(expected['sum'], results['sum'])} "
+            f"{np.isclose(expected['sum'], resumed['sum'])}"
+        )
+        os.rmdir(checkpoint_dir)
+        return medians
 
-        logger.info(f"Processing completed in {processing_time:.2f}s")
-        for operation, result in results_by_operation.items():
-            logger.info(f"{operation}: {result}")
+    @requires_ray
+    def benchmark_placement(
+        self, matrix_size: int = 1000, cpus_per_task: int = 1, repeats: int = 3
+    ) -> Dict[str, float]:
+        """
+        并发任务数等于可用槽位数（num_cpus // cpus_per_task）时的矩阵乘法吞吐（GFLOP/s）
 
+        - default: Ray 默认设置，BLAS 线程数取决于 worker 的环境
+        - capped: placement_options 声明 CPU 数并限制 BLAS 线程数
+        - pinned: PinnedWorkerPool，另外把每个 worker 绑定到互不重叠的 CPU 集合
+        每种方式先运行一轮预热（启动对应的 worker），再取 repeats 轮的中位数。
+        """
+        slots = max(1, self.num_cpus // cpus_per_task)
+        logger.info(
+            f"=== Placement Benchmark: {slots} concurrent {matrix_size}x{matrix_size} "
+            f"matmuls, {cpus_per_task} CPU(s) per task ==="
+        )
+        A_ref = ray.put(np.random.random((matrix_size, matrix_size)))
+        B_ref = ray.put(np.random.random((matrix_size, matrix_size)))
+        flops = slots * 2 * matrix_size**3
+
+        capped = matrix_multiply.options(**placement_options(cpus_per_task))
+        submitters = {
+            "default": matrix_multiply.remote,
+            "capped": capped.remote,
+            "pinned": None,
+        }
+
+        # Actor 会一直占用声明的 CPU，轮到 pinned 时才创建
+        pool = None
+        throughput = {}
+        try:
+            for name, submit in submitters.items():
+                if name == "pinned":
+                    pool = PinnedWorkerPool(cpus_per_task)
+                    submit = lambda a, b: pool.submit(matrix_multiply, a, b)
+                times = []
+                for i in range(repeats + 1):
+                    start_time = time.time()
+                    ray.get([submit(A_ref, B_ref) for _ in range(slots)])
+                    if i > 0:
+                        times.append(time.time() - start_time)
+                throughput[name] = flops / float(np.median(times)) / 1e9
+                logger.info(f"{name}: {throughput[name]:.2f} GFLOP/s")
+            logger.info(f"Pinned workers: {pool.get_placement()}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        logger.info(
+            f"capped vs default: {throughput['capped'] / throughput['default']:.2f}x, "
+            f"pinned vs default: {throughput['pinned'] / throughput['default']:.2f}x"
+        )
+        return throughput
+
+    def run_pi(self, n_tasks: int, samples_per_task: int) -> Dict[str, Any]:
+        """用 compute_pi_chunk 在当前后端上并行估算 π"""
+        start_time = time.time()
+        executor = self._executor_for("pi", n_tasks * samples_per_task)
+        futures = [
+            executor.submit(compute_pi_chunk, samples_per_task) for _ in range(n_tasks)
+        ]
+        pi = sum(f.result() for f in futures) / n_tasks
+        return {
+            "backend": executor.name,
+            "pi": pi,
+            "elapsed_time": time.time() - start_time,
+        }
+
+    def run_matmul(self, A: np.ndarray, B: np.ndarray) -> np.ndarray:
+        """用 matrix_multiply 在当前后端上按行分块计算 A @ B，B 只传递一次"""
+        n = A.shape[0]
+        executor = self._executor_for("matmul", 2 * n * A.shape[1] * B.shape[1])
+        row_tile = max(1, -(-n // self.num_cpus))
+        B_handle = executor.put(B)
+        futures = []
+        try:
+            for i in range(0, n, row_tile):
+                futures.append(
+                    (
+                        i,
+                        executor.submit(matrix_multiply, A[i : i + row_tile], B_handle),
+                    )
+                )
+            C = np.empty((n, B.shape[1]), dtype=np.result_type(A, B))
+            for i, future in futures:
+                C[i : i + row_tile] = future.result()
+        finally:
+            # 出错时先等其余任务结束，再释放它们仍在使用的共享内存
+            wait_futures([future for _, future in futures])
+            if B_handle is not B and hasattr(executor, "release"):
+                executor.release(B_handle)
+        return C
+
+    def run_reduction(
+        self, data: np.ndarray, operation: str = "sum", n_chunks: int = None
+    ) -> float:
+        """用 process_data_chunk 在当前后端上分块归约（sum/mean/max/min）"""
+        data = np.asarray(data)
+        executor = self._executor_for("reduce", data.size)
+        chunks = np.array_split(data, n_chunks or self.num_cpus)
+        chunks = [chunk for chunk in chunks if chunk.size]
+        futures = [
+            executor.submit(process_data_chunk, chunk, operation) for chunk in chunks
+        ]
+        values = [f.result() for f in futures]
+        if operation == "mean":
+            # 按各块大小加权
+            return float(np.average(values, weights=[c.size for c in chunks]))
+        return {"sum": sum, "max": max, "min": min}[operation](values)
+
+    @requires_ray
     def get_cluster_info(self) -> Dict[str, Any]:
         """获取集群信息"""
         return {
@@ -329,18 +2237,70 @@ class RayDistributedSystem:
         }
 
     def shutdown(self):
-        """关闭 Ray 集群"""
+        """关闭执行器和 Ray 集群；复用的集群只断开连接，集群继续运行"""
+        for executor in self.executors.values():
+            executor.shutdown()
+        self.executors.clear()
+        if not self.ray_started:
+            return
+        self.ray_started = False
         if ray.is_initialized():
             ray.shutdown()
-            logger.info("Ray cluster shutdown")
+            if self.attached:
+                logger.info("Disconnected from Ray cluster")
+            else:
+                logger.info("Ray cluster shutdown")
 
 
 def main():
     """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ray Distributed System Demo")
+    parser.add_argument(
+        "--address",
+        default=None,
+        help='attach to a running cluster, e.g. "auto" after `ray start --head`',
+    )
+    parser.add_argument(
+        "--prewarm", action="store_true", help="start and warm up workers first"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="compare cold vs warm startup time and exit",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        default=None,
+        help="checkpoint pipeline partitions here and resume from them on restart",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="resubmission budget for failed pipeline chunks",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    args = parser.parse_args()
+
+    if args.startup_report:
+        startup_report(args.address or "auto")
+        return
+
     logger.info("Starting Ray Distributed System Demo")
 
     # 创建分布式系统
-    system = RayDistributedSystem()
+    system = RayDistributedSystem(address=args.address, prewarm=args.prewarm)
+    # 指标在整个运行期间持续更新，包括演示结束后的等待
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(args.metrics_port).start()
 
     try:
         # 显示集群信息
@@ -354,7 +2314,9 @@ def main():
         system.demo_actors()
         print()
 
-        system.demo_data_processing_pipeline()
+        system.demo_data_processing_pipeline(
+            checkpoint_dir=args.checkpoint_dir, max_retries=args.max_retries
+        )
 
     except Exception as e:
         logger.error(f"Error during execution: {e}")
@@ -365,6 +2327,8 @@ def main():
     finally:
         time.sleep(1000000)
         # 清理资源
+        if metrics_server is not None:
+            metrics_server.stop()
         system.shutdown()
 
 
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Ray 演示系统的实时指标
+以 Prometheus 文本格式在本地 HTTP 端口提供任务吞吐、排队深度、Actor 调用延迟、
+对象存储用量和各 worker 进程的 CPU/RSS
+
+本模块不依赖 ray_main，ray_main 在 stream_tasks 和 Actor 调用处直接更新这里的指标。
+"""
+
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+import ray
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的桶上界（秒）
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# 后台采集对象存储与 worker 进程指标的间隔（秒）
+DEFAULT_COLLECT_INTERVAL = 2.0
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """带标签的指标，标签值按 label_names 的顺序以位置参数传入"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: List[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], Any] = {}
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(样本名, 标签字符串, 值) 列表"""
+        with self.lock:
+            return [
+                (self.name, _format_labels(self.label_names, labels), value)
+                for labels, value in self.values.items()
+            ]
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(
+            f"{name}{labels} {value!r}" for name, labels, value in self.samples()
+        )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0.0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        with self.lock:
+            self.values[labels] = float(value)
+
+    def remove(self, *labels: str):
+        with self.lock:
+            self.values.pop(labels, None)
+
+
+class Histogram(Metric):
+    """累积桶直方图，每个标签组合保存 [各桶计数, 总和, 总数]"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: List[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        rows = []
+        with self.lock:
+            for labels, (counts, total, count) in self.values.items():
+                names = self.label_names + ("le",)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    rows.append(
+                        (
+                            f"{self.name}_bucket",
+                            _format_labels(names, labels + (le,)),
+                            cumulative,
+                        )
+                    )
+                label_str = _format_labels(self.label_names, labels)
+                rows.append((f"{self.name}_sum", label_str, total))
+                rows.append((f"{self.name}_count", label_str, count))
+        return rows
+
+
+class MetricsRegistry:
+    """指标注册表，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Any:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names=()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names=()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names=(),
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self.metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TASKS_SUBMITTED = REGISTRY.counter(
+    "ray_demo_tasks_submitted_total", "Tasks submitted through stream_tasks", ["desc"]
+)
+TASKS_COMPLETED = REGISTRY.counter(
+    "ray_demo_tasks_completed_total", "Tasks completed through stream_tasks", ["desc"]
+)
+TASKS_FAILED = REGISTRY.counter(
+    "ray_demo_tasks_failed_total", "Tasks that raised, including retried ones", ["desc"]
+)
+TASKS_IN_FLIGHT = REGISTRY.gauge(
+    "ray_demo_tasks_in_flight", "Tasks submitted but not yet completed", ["desc"]
+)
+TASK_THROUGHPUT = REGISTRY.gauge(
+    "ray_demo_task_throughput",
+    "Completed tasks per second over the last collection interval",
+    ["desc"],
+)
+ACTOR_QUEUE_DEPTH = REGISTRY.gauge(
+    "ray_demo_actor_queue_depth", "Calls queued on each pool actor", ["actor"]
+)
+ACTOR_CALL_LATENCY = REGISTRY.histogram(
+    "ray_demo_actor_call_latency_seconds",
+    "Actor call latency from submission to result, seen by the driver",
+    ["actor", "method"],
+)
+OBJECT_STORE_CAPACITY = REGISTRY.gauge(
+    "ray_demo_object_store_capacity_bytes", "Object store memory of the cluster"
+)
+OBJECT_STORE_USED = REGISTRY.gauge(
+    "ray_demo_object_store_used_bytes", "Object store memory in use on this node"
+)
+OBJECT_STORE_OBJECTS = REGISTRY.gauge(
+    "ray_demo_object_store_objects", "Objects in the object store on this node"
+)
+WORKER_CPU = REGISTRY.gauge(
+    "ray_demo_worker_cpu_percent", "CPU usage of each Ray worker process", ["pid"]
+)
+WORKER_RSS = REGISTRY.gauge(
+    "ray_demo_worker_rss_bytes", "Resident memory of each Ray worker process", ["pid"]
+)
+
+
+def observe_call(actor: str, method: str, submit_time: float):
+    """记录一次 Actor 调用从提交到取得结果的延迟"""
+    ACTOR_CALL_LATENCY.observe(time.time() - submit_time, actor, method)
+
+
+def timed_get(refs: Any, actor: str, method: str, submit_time: float) -> Any:
+    """
+    等待在 submit_time 提交的一个或一组 Actor 调用，按各自完成的时间记录延迟
+
+    返回值与 ray.get(refs) 相同。
+    """
+    pending = [refs] if isinstance(refs, ray.ObjectRef) else list(refs)
+    while pending:
+        ready, pending = ray.wait(pending, num_returns=1)
+        for _ in ready:
+            observe_call(actor, method, submit_time)
+    return ray.get(refs)
+
+
+class MetricsCollector:
+    """
+    后台线程：定期采集对象存储用量、worker 进程 CPU/RSS，并计算任务吞吐
+
+    worker 进程按进程名 ray::* 识别（不含 Ray 自身的 Agent 进程），只覆盖本机。
+    """
+
+    def __init__(self, interval: float = DEFAULT_COLLECT_INTERVAL):
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.processes = {}
+        self.last_completed = {}
+        self.last_time = time.time()
+        # 内部 API 不可用时置为 False，不再尝试
+        self.memory_info = None
+        self.thread = threading.Thread(
+            target=self._run, name="metrics-collector", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.collect()
+            except Exception as e:
+                logger.warning(f"Metrics collection failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def collect(self):
+        self._collect_throughput()
+        if ray.is_initialized():
+            self._collect_object_store()
+        self._collect_workers()
+
+    def _collect_throughput(self):
+        now = time.time()
+        elapsed = now - self.last_time
+        self.last_time = now
+        for (desc,), completed in list(TASKS_COMPLETED.values.items()):
+            previous = self.last_completed.get(desc, 0.0)
+            self.last_completed[desc] = completed
+            if elapsed > 0:
+                TASK_THROUGHPUT.set((completed - previous) / elapsed, desc)
+
+    def _collect_object_store(self):
+        OBJECT_STORE_CAPACITY.set(ray.cluster_resources().get("object_store_memory", 0))
+        if self.memory_info is False:
+            return
+        # 对象存储用量只能通过内部 API 获取（需要 grpc），不可用时只报告容量
+        try:
+            from ray._private.internal_api import (
+                get_memory_info_reply,
+                get_state_from_address,
+            )
+
+            reply = get_memory_info_reply(
+                get_state_from_address(ray.get_runtime_context().gcs_address)
+            )
+        except ImportError as e:
+            logger.info(f"Object store usage unavailable: {e}")
+            self.memory_info = False
+            return
+        OBJECT_STORE_USED.set(reply.store_stats.object_store_bytes_used)
+        OBJECT_STORE_OBJECTS.set(reply.store_stats.num_local_objects)
+
+    def _collect_workers(self):
+        import psutil
+
+        alive = set()
+        for proc in psutil.process_iter(["pid", "cmdline"]):
+            cmdline = proc.info["cmdline"] or [""]
+            title = cmdline[0]
+            if not title.startswith("ray::") or title.endswith("Agent"):
+                continue
+            pid = proc.info["pid"]
+            alive.add(pid)
+            # 复用 Process 对象，cpu_percent 计算的是两次采集之间的平均值
+            tracked = self.processes.setdefault(pid, proc)
+            try:
+                WORKER_CPU.set(tracked.cpu_percent(), str(pid))
+                WORKER_RSS.set(tracked.memory_info().rss, str(pid))
+            except psutil.NoSuchProcess:
+                alive.discard(pid)
+
+        for pid in set(self.processes) - alive:
+            del self.processes[pid]
+            WORKER_CPU.remove(str(pid))
+            WORKER_RSS.remove(str(pid))
+
+
+class MetricsServer:
+    """在 host:port/metrics 上提供 Prometheus 文本格式的指标，并运行后台采集"""
+
+    def __init__(
+        self,
+        port: int = 9100,
+        host: str = "127.0.0.1",
+        registry: MetricsRegistry = REGISTRY,
+        collect_interval: float = DEFAULT_COLLECT_INTERVAL,
+    ):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.collector = MetricsCollector(collect_interval)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self.collector.start()
+        self.thread.start()
+        logger.info(f"Serving metrics on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.collector.stop()
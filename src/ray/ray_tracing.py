@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Ray 任务级追踪
+记录每次远程调用的提交（含参数序列化）、调度等待、执行、结果获取耗时，
+导出 Chrome trace / Perfetto 可读的 JSON 时间线，并汇总耗时最多的环节
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import ray
+
+from ray_main import (
+    DataProcessor,
+    compute_pi_hits,
+    logger,
+    matrix_multiply,
+)
+
+
+def _timed(fn):
+    """包装函数，使其同时返回结果和 worker 端的执行时间戳"""
+
+    def call(*args, **kwargs):
+        start = time.time()
+        result = fn(*args, **kwargs)
+        return result, (start, time.time(), os.getpid(), threading.get_ident())
+
+    return call
+
+
+def _timed_method(actor, method_name: str, *args, **kwargs):
+    """通过 __ray_call__ 在 Actor 上执行，调用原方法并返回执行时间戳"""
+    return _timed(getattr(actor, method_name))(*args, **kwargs)
+
+
+class TracedRef:
+    """带有提交时间戳的对象引用，通过 TaskTracer.get 获取结果"""
+
+    __slots__ = ("ref", "name", "task_id", "submit_start", "submit_end")
+
+    def __init__(self, ref, name, task_id, submit_start, submit_end):
+        self.ref = ref
+        self.name = name
+        self.task_id = task_id
+        self.submit_start = submit_start
+        self.submit_end = submit_end
+
+
+class TracedRemoteFunction:
+    """被追踪的远程函数，用法与原远程函数相同：traced.remote(*args)"""
+
+    def __init__(self, tracer: "TaskTracer", remote_fn: Any, name: str):
+        self.tracer = tracer
+        self.name = name
+        self.timed_fn = ray.remote(_timed(remote_fn._function))
+
+    def remote(self, *args, **kwargs) -> TracedRef:
+        submit_start = time.time()
+        ref = self.timed_fn.remote(*args, **kwargs)
+        return self.tracer._submitted(ref, self.name, submit_start)
+
+
+class TracedActorMethod:
+    def __init__(self, tracer: "TaskTracer", handle: Any, method_name: str, name: str):
+        self.tracer = tracer
+        self.handle = handle
+        self.method_name = method_name
+        self.name = name
+
+    def remote(self, *args, **kwargs) -> TracedRef:
+        submit_start = time.time()
+        ref = self.handle.__ray_call__.remote(
+            _timed_method, self.method_name, *args, **kwargs
+        )
+        return self.tracer._submitted(ref, self.name, submit_start)
+
+
+class TracedActor:
+    """
+    被追踪的 Actor 句柄：traced.process_batch.remote(...)
+
+    通过 Actor 的 __ray_call__ 执行，只适用于同步 Actor。
+    """
+
+    def __init__(self, tracer: "TaskTracer", handle: Any, name: str):
+        self.tracer = tracer
+        self.handle = handle
+        self.name = name
+
+    def __getattr__(self, method_name: str) -> TracedActorMethod:
+        return TracedActorMethod(
+            self.tracer, self.handle, method_name, f"{self.name}.{method_name}"
+        )
+
+
+class TaskTracer:
+    """
+    任务级追踪器
+
+    每个任务记录以下阶段（同一台机器上各进程的 time.time() 可以直接比较）：
+        submit:   driver 调用 .remote() 的耗时，包括参数序列化
+        schedule: 提交完成到 worker 开始执行，包括调度排队和参数获取
+        execute:  worker 上函数本身的执行时间
+        wait:     driver 开始获取结果到任务执行结束之间的等待
+        fetch:    结果传输与反序列化
+    """
+
+    def __init__(self):
+        self.spans: List[Tuple[str, str, float, float, int, int]] = []
+        self.task_count = 0
+        self.driver_pid = os.getpid()
+
+    def wrap(self, remote_fn: Any, name: str = None) -> TracedRemoteFunction:
+        """追踪远程函数，如 tracer.wrap(compute_pi_hits)"""
+        return TracedRemoteFunction(
+            self, remote_fn, name or remote_fn._function.__name__
+        )
+
+    def wrap_actor(self, handle: Any, name: str) -> TracedActor:
+        """追踪 Actor 的方法调用，如 tracer.wrap_actor(processor, "DataProcessor")"""
+        return TracedActor(self, handle, name)
+
+    def _submitted(self, ref, name: str, submit_start: float) -> TracedRef:
+        self.task_count += 1
+        return TracedRef(ref, name, self.task_count, submit_start, time.time())
+
+    def get(self, traced_refs: Any) -> Any:
+        """获取一个或一组 TracedRef 的结果，并记录各阶段耗时"""
+        single = isinstance(traced_refs, TracedRef)
+        if single:
+            traced_refs = [traced_refs]
+
+        get_start = time.time()
+        outputs = ray.get([t.ref for t in traced_refs])
+        get_end = time.time()
+
+        results = []
+        for traced, (result, (exec_start, exec_end, pid, tid)) in zip(
+            traced_refs, outputs
+        ):
+            name, task_id = traced.name, traced.task_id
+            fetch_start = max(exec_end, get_start)
+            self.spans.extend(
+                [
+                    (
+                        name,
+                        "submit",
+                        traced.submit_start,
+                        traced.submit_end,
+                        0,
+                        task_id,
+                    ),
+                    (name, "schedule", traced.submit_end, exec_start, 0, task_id),
+                    (name, "execute", exec_start, exec_end, pid, tid),
+                    (name, "wait", get_start, fetch_start, 0, task_id),
+                    (name, "fetch", fetch_start, get_end, 0, task_id),
+                ]
+            )
+            results.append(result)
+        return results[0] if single else results
+
+    def export_chrome_trace(self, path: str):
+        """
+        导出 Chrome trace 格式（chrome://tracing 或 https://ui.perfetto.dev 打开）
+
+        driver 端的阶段按任务分行显示，执行阶段显示在对应的 worker 进程下。
+        """
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.driver_pid,
+                "args": {"name": "driver"},
+            }
+        ]
+        worker_pids = set()
+        for name, phase, start, end, pid, tid in self.spans:
+            if pid:
+                worker_pids.add(pid)
+            events.append(
+                {
+                    "name": name,
+                    "cat": phase,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": max(0.0, end - start) * 1e6,
+                    "pid": pid or self.driver_pid,
+                    "tid": tid,
+                    "args": {"phase": phase},
+                }
+            )
+        for pid in worker_pids:
+            events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": f"worker {pid}"},
+                }
+            )
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Trace with {len(self.spans)} spans written to {path}")
+
+    def summary(self, top: int = 10) -> List[Dict[str, Any]]:
+        """按 (任务名, 阶段) 汇总总耗时，输出耗时最多的 top 项"""
+        totals = {}
+        for name, phase, start, end, _, _ in self.spans:
+            entry = totals.setdefault((name, phase), [0, 0.0, 0.0])
+            duration = max(0.0, end - start)
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+
+        rows = [
+            {
+                "name": name,
+                "phase": phase,
+                "count": count,
+                "total": total,
+                "mean": total / count,
+                "max": longest,
+            }
+            for (name, phase), (count, total, longest) in totals.items()
+        ]
+        rows.sort(key=lambda r: r["total"], reverse=True)
+        rows = rows[:top]
+
+        logger.info(
+            f"{'name':<32} {'phase':<9} {'count':>6} "
+            f"{'total(s)':>9} {'mean(ms)':>9} {'max(ms)':>9}"
+        )
+        for r in rows:
+            logger.info(
+                f"{r['name']:<32} {r['phase']:<9} {r['count']:>6} "
+                f"{r['total']:>9.3f} {r['mean'] * 1000:>9.2f} {r['max'] * 1000:>9.2f}"
+            )
+        return rows
+
+
+def demo_tracing(output: str = "ray_trace.json", num_cpus: int = None):
+    """追踪 π 估算、矩阵乘法和 DataProcessor 批处理，导出时间线并输出汇总"""
+    from ray_main import RayDistributedSystem
+
+    system = RayDistributedSystem(num_cpus=num_cpus)
+    tracer = TaskTracer()
+    try:
+        traced_pi = tracer.wrap(compute_pi_hits)
+        seeds = np.random.SeedSequence().spawn(system.num_cpus)
+        tracer.get([traced_pi.remote(1000000, s) for s in seeds])
+
+        traced_matmul = tracer.wrap(matrix_multiply)
+        A = np.random.random((1000, 1000))
+        B_ref = ray.put(np.random.random((1000, 1000)))
+        tracer.get(
+            [traced_matmul.remote(A[i : i + 250], B_ref) for i in range(0, 1000, 250)]
+        )
+
+        processors = [
+            tracer.wrap_actor(DataProcessor.remote(f"processor_{i}"), "DataProcessor")
+            for i in range(2)
+        ]
+        batches = [np.random.random(100000) for _ in range(8)]
+        tracer.get(
+            [
+                processors[i % len(processors)].process_batch.remote(batch)
+                for i, batch in enumerate(batches)
+            ]
+        )
+
+        tracer.export_chrome_trace(output)
+        tracer.summary()
+    finally:
+        system.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace RayDistributedSystem tasks")
+    parser.add_argument("--output", default="ray_trace.json")
+    parser.add_argument("--num-cpus", type=int, default=None)
+    args = parser.parse_args()
+    demo_tracing(args.output, args.num_cpus)
+
+
+if __name__ == "__main__":
+    main()
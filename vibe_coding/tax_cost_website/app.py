@@ -1,7 +1,22 @@
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
+from functools import lru_cache
 import math
 
+import numpy as np
+
+from tax_engine import (
+    DEFAULT_SWEEP_FIELDS,
+    calculate_batch,
+    contribution_items,
+    get_policy,
+    parse_batch_inputs,
+    parse_solve_inputs,
+    solve_monthly_salary,
+    sweep_salaries,
+    to_columns,
+)
+
 app = Flask(__name__)
 CORS(app)
 
@@ -12,148 +27,116 @@ def calculate_tax_and_cost(
     social_insurance_base,
     housing_fund_base,
     special_deduction,
+    policy=None,
 ):
     """
     计算个人所得税和公司用人成本
-    """
-    # 社保公积金缴纳比例（根据杭州政策示例）
-    # 个人缴纳比例
-    pension_ins_rate_personal = 0.08  # 养老保险个人比例
-    medical_ins_rate_personal = 0.02  # 医疗保险个人比例
-    unemployment_ins_rate_personal = 0.005  # 失业保险个人比例
-    housing_fund_rate_personal = 0.12  # 公积金个人比例
-
-    # 公司缴纳比例
-    pension_ins_rate_company = 0.14  # 养老保险单位比例
-    medical_ins_rate_company = 0.095  # 医疗保险单位比例
-    unemployment_ins_rate_company = 0.005  # 失业保险单位比例
-    injury_ins_rate_company = 0.002  # 工伤保险单位比例
-    housing_fund_rate_company = 0.12  # 公积金单位比例
-
-    # 1. 计算个人每月专项扣除（社保公积金个人部分）
-    monthly_pension_personal = social_insurance_base * pension_ins_rate_personal
-    monthly_medical_personal = social_insurance_base * medical_ins_rate_personal
-    monthly_unemployment_personal = (
-        social_insurance_base * unemployment_ins_rate_personal
-    )
-    monthly_housing_fund_personal = housing_fund_base * housing_fund_rate_personal
-
-    monthly_social_insurance_personal = (
-        monthly_pension_personal
-        + monthly_medical_personal
-        + monthly_unemployment_personal
-    )
 
-    monthly_total_deduction_personal = (
-        monthly_social_insurance_personal + monthly_housing_fund_personal
-    )
-    annual_total_deduction_personal = monthly_total_deduction_personal * 12
-
-    # 2. 计算全年收入
-    annual_income = monthly_salary * annual_months
-
-    # 3. 计算全年应纳税所得额
-    basic_deduction = 60000  # 基本减除费用
-    taxable_income = (
-        annual_income
-        - basic_deduction
-        - annual_total_deduction_personal
-        - special_deduction
-    )
-
-    # 确保应纳税所得额不为负数
-    taxable_income = max(0, taxable_income)
-
-    # 4. 计算全年个人所得税（使用超额累进税率）
-    tax_brackets = [
-        (36000, 0.03, 0),
-        (144000, 0.10, 2520),
-        (300000, 0.20, 16920),
-        (420000, 0.25, 31920),
-        (660000, 0.30, 52920),
-        (960000, 0.35, 85920),
-        (float("inf"), 0.45, 181920),
-    ]
-
-    annual_tax = 0
-    applied_rate = 0
-    deduction_amount = 0
-
-    # 正确方法：直接对整个应纳税所得额应用对应税率和速算扣除数
-    for threshold, rate, deduction in tax_brackets:
-        if taxable_income <= threshold:
-            annual_tax = taxable_income * rate - deduction
-            applied_rate = rate
-            deduction_amount = deduction
-            break
-
-    # 5. 计算税后收入
-    after_tax_income = annual_income - annual_total_deduction_personal - annual_tax
-
-    # 6. 计算公司用人成本
-    # 公司每月承担部分
-    monthly_pension_company = social_insurance_base * pension_ins_rate_company
-    monthly_medical_company = social_insurance_base * medical_ins_rate_company
-    monthly_unemployment_company = social_insurance_base * unemployment_ins_rate_company
-    monthly_injury_company = social_insurance_base * injury_ins_rate_company
-    monthly_housing_fund_company = housing_fund_base * housing_fund_rate_company
-
-    monthly_social_insurance_company = (
-        monthly_pension_company
-        + monthly_medical_company
-        + monthly_unemployment_company
-        + monthly_injury_company
-    )
-
-    monthly_company_cost = (
-        monthly_social_insurance_company + monthly_housing_fund_company
+    policy 为缴纳比例和税率表（tax_engine.TaxPolicy），缺省为杭州政策；
+    汇总结果取自 tax_engine.calculate_batch，这里只组装详细的分项结果
+    """
+    policy = policy or get_policy()
+    results = {
+        name: float(value)
+        for name, value in calculate_batch(
+            monthly_salary,
+            annual_months,
+            social_insurance_base,
+            housing_fund_base,
+            special_deduction,
+            policy,
+        ).items()
+    }
+    personal, company = contribution_items(
+        float(social_insurance_base), float(housing_fund_base), policy
     )
-    annual_company_cost = monthly_company_cost * 12 + annual_income
 
     # 返回详细结果
     return {
-        "annual_income": annual_income,
-        "basic_deduction": basic_deduction,
+        "annual_income": results["annual_income"],
+        "basic_deduction": policy.basic_deduction,
         "special_deduction": special_deduction,
         "personal_insurance": {
-            "monthly_pension": monthly_pension_personal,
-            "monthly_medical": monthly_medical_personal,
-            "monthly_unemployment": monthly_unemployment_personal,
-            "monthly_housing_fund": monthly_housing_fund_personal,
-            "monthly_total": monthly_total_deduction_personal,
-            "annual_total": annual_total_deduction_personal,
+            **personal,
+            "monthly_total": results["personal_monthly_total"],
+            "annual_total": results["personal_annual_total"],
         },
         "company_insurance": {
-            "monthly_pension": monthly_pension_company,
-            "monthly_medical": monthly_medical_company,
-            "monthly_unemployment": monthly_unemployment_company,
-            "monthly_injury": monthly_injury_company,
-            "monthly_housing_fund": monthly_housing_fund_company,
-            "monthly_total": monthly_company_cost,
-            "annual_total": monthly_company_cost * 12,
+            **company,
+            "monthly_total": results["company_monthly_total"],
+            "annual_total": results["company_annual_total"],
         },
         "tax_calculation": {
-            "taxable_income": taxable_income,
-            "applied_rate": applied_rate,
-            "deduction_amount": deduction_amount,
-            "annual_tax": annual_tax,
+            name: results[name]
+            for name in (
+                "taxable_income",
+                "applied_rate",
+                "deduction_amount",
+                "annual_tax",
+            )
         },
         "final_results": {
-            "after_tax_income": after_tax_income,
-            "monthly_after_tax": after_tax_income / 12,
-            "annual_company_cost": annual_company_cost,
-            "monthly_company_cost": annual_company_cost / 12,
-            "total_social_insurance": monthly_social_insurance_personal * 12
-            + monthly_social_insurance_company * 12,
-            "total_housing_fund": monthly_housing_fund_personal * 12
-            + monthly_housing_fund_company * 12,
-            "total_cash_benefit": after_tax_income
-            + monthly_housing_fund_personal * 12
-            + monthly_housing_fund_company * 12,
+            name: results[name]
+            for name in (
+                "after_tax_income",
+                "monthly_after_tax",
+                "annual_company_cost",
+                "monthly_company_cost",
+                "total_social_insurance",
+                "total_housing_fund",
+                "total_cash_benefit",
+            )
         },
     }
 
 
+# 单次计算结果缓存的最大条目数
+RESULT_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=RESULT_CACHE_SIZE)
+def _cached_calculation(
+    monthly_salary_cents,
+    annual_months,
+    social_insurance_base_cents,
+    housing_fund_base_cents,
+    special_deduction_cents,
+    policy,
+):
+    return calculate_tax_and_cost(
+        monthly_salary_cents / 100,
+        annual_months,
+        social_insurance_base_cents / 100,
+        housing_fund_base_cents / 100,
+        special_deduction_cents / 100,
+        policy,
+    )
+
+
+def calculate_cached(
+    monthly_salary,
+    annual_months,
+    social_insurance_base,
+    housing_fund_base,
+    special_deduction,
+    policy=None,
+):
+    """
+    带 LRU 缓存的 calculate_tax_and_cost
+
+    金额归一化为整数分后与政策一起作为缓存键（政策按内容比较，替换同名政策后
+    不会命中旧结果）。返回的字典在多次调用间共享，调用方不能修改。
+    """
+    return _cached_calculation(
+        round(float(monthly_salary) * 100),
+        float(annual_months),
+        round(float(social_insurance_base) * 100),
+        round(float(housing_fund_base) * 100),
+        round(float(special_deduction) * 100),
+        policy or get_policy(),
+    )
+
+
 @app.route("/")
 def index():
     """首页"""
@@ -170,13 +153,15 @@ def api_calculate():
         social_insurance_base = float(data.get("social_insurance_base", 4812))
         housing_fund_base = float(data.get("housing_fund_base", 30000))
         special_deduction = float(data.get("special_deduction", 0))
+        policy = get_policy(data.get("policy"))
 
-        result = calculate_tax_and_cost(
+        result = calculate_cached(
             monthly_salary,
             annual_months,
             social_insurance_base,
             housing_fund_base,
             special_deduction,
+            policy,
         )
 
         return jsonify({"success": True, "data": result})
@@ -184,5 +169,132 @@ def api_calculate():
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+@app.route("/api/calculate/batch", methods=["POST"])
+def api_calculate_batch():
+    """
+    批量计算API：各输入字段可以是数组或标量（标量对所有行生效），
+    返回列式结果 {列名: [各行的值]}；fields 指定返回的列，"all" 返回全部列，
+    缺省时只返回主要结果列（序列化是批量请求的主要开销）
+    """
+    try:
+        data = request.json
+        inputs = parse_batch_inputs(data)
+        results = calculate_batch(**inputs, policy=get_policy(data.get("policy")))
+        columns = to_columns(results, data.get("fields"))
+
+        return jsonify(
+            {
+                "success": True,
+                "data": {
+                    "count": int(np.size(results["annual_income"])),
+                    "columns": columns,
+                },
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/calculate/sweep", methods=["POST"])
+def api_calculate_sweep():
+    """
+    薪资曲线API：月薪按 salary_min / salary_max / step 取值，annual_months
+    可以是一组值（每个值一条曲线），其余参数与 /api/calculate 相同；
+    一次请求返回所有曲线以及边际税率跳变点，供前端绘制图表
+    """
+    try:
+        data = request.json
+        salaries, months, results, boundaries = sweep_salaries(
+            float(data.get("salary_min", 5000)),
+            float(data.get("salary_max", 100000)),
+            float(data.get("step", 1000)),
+            annual_months=data.get("annual_months", 13),
+            social_insurance_base=float(data.get("social_insurance_base", 4812)),
+            housing_fund_base=float(data.get("housing_fund_base", 30000)),
+            special_deduction=float(data.get("special_deduction", 0)),
+            policy=get_policy(data.get("policy")),
+        )
+        fields = data.get("fields") or DEFAULT_SWEEP_FIELDS
+        curves = []
+        for i, annual_months in enumerate(months):
+            curve = {name: values[i] for name, values in results.items()}
+            curves.append(
+                {
+                    "annual_months": float(annual_months),
+                    "columns": to_columns(curve, fields),
+                }
+            )
+
+        return jsonify(
+            {
+                "success": True,
+                "data": {
+                    "monthly_salary": to_columns(
+                        {"monthly_salary": salaries}, ["monthly_salary"]
+                    )["monthly_salary"],
+                    "curves": curves,
+                    "boundaries": boundaries,
+                },
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/solve", methods=["POST"])
+def api_solve():
+    """
+    反解API：给出目标税后年收入 after_tax_income 或公司年成本预算
+    annual_company_cost（二选一，可以是数组），按段直接解出月薪；
+    其余字段与批量计算API相同，返回解出月薪对应的列式计算结果
+    """
+    try:
+        data = request.json
+        target, inputs = parse_solve_inputs(data)
+        policy = get_policy(data.get("policy"))
+        monthly_salary = solve_monthly_salary(target, **inputs, policy=policy)
+        results = calculate_batch(
+            monthly_salary,
+            inputs["annual_months"],
+            inputs["social_insurance_base"],
+            inputs["housing_fund_base"],
+            inputs["special_deduction"],
+            policy,
+        )
+        columns = to_columns(results, data.get("fields"))
+
+        return jsonify(
+            {
+                "success": True,
+                "data": {
+                    "target": target,
+                    "count": int(np.size(monthly_salary)),
+                    "columns": columns,
+                },
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/cache/stats")
+def api_cache_stats():
+    """单次计算结果缓存的命中统计"""
+    info = _cached_calculation.cache_info()
+    lookups = info.hits + info.misses
+    return jsonify(
+        {
+            "success": True,
+            "data": {
+                "hits": info.hits,
+                "misses": info.misses,
+                "hit_rate": info.hits / lookups if lookups else 0.0,
+                "size": info.currsize,
+                "max_size": info.maxsize,
+            },
+        }
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5001)
@@ -0,0 +1,507 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# 社保公积金缴纳比例、基本减除费用和税率表，按城市/年度划分
+TaxPolicy = namedtuple(
+    "TaxPolicy",
+    [
+        "name",
+        # 个人缴纳比例
+        "pension_ins_rate_personal",  # 养老保险个人比例
+        "medical_ins_rate_personal",  # 医疗保险个人比例
+        "unemployment_ins_rate_personal",  # 失业保险个人比例
+        "housing_fund_rate_personal",  # 公积金个人比例
+        # 公司缴纳比例
+        "pension_ins_rate_company",  # 养老保险单位比例
+        "medical_ins_rate_company",  # 医疗保险单位比例
+        "unemployment_ins_rate_company",  # 失业保险单位比例
+        "injury_ins_rate_company",  # 工伤保险单位比例
+        "housing_fund_rate_company",  # 公积金单位比例
+        "basic_deduction",  # 基本减除费用
+        # 全年应纳税所得额税率表：((级距上限, 税率, 速算扣除数), ...)
+        "tax_brackets",
+    ],
+)
+
+# 全年综合所得税率表（各地相同）
+TAX_BRACKETS = (
+    (36000, 0.03, 0),
+    (144000, 0.10, 2520),
+    (300000, 0.20, 16920),
+    (420000, 0.25, 31920),
+    (660000, 0.30, 52920),
+    (960000, 0.35, 85920),
+    (float("inf"), 0.45, 181920),
+)
+
+# 杭州政策示例
+HANGZHOU = TaxPolicy(
+    name="hangzhou",
+    pension_ins_rate_personal=0.08,
+    medical_ins_rate_personal=0.02,
+    unemployment_ins_rate_personal=0.005,
+    housing_fund_rate_personal=0.12,
+    pension_ins_rate_company=0.14,
+    medical_ins_rate_company=0.095,
+    unemployment_ins_rate_company=0.005,
+    injury_ins_rate_company=0.002,
+    housing_fund_rate_company=0.12,
+    basic_deduction=60000,
+    tax_brackets=TAX_BRACKETS,
+)
+
+# 可选的政策：名称 -> TaxPolicy，其他城市或年度用 register_policy 添加，
+# 通常在已有政策上用 _replace 修改比例，如 HANGZHOU._replace(name=..., ...)
+POLICIES = {HANGZHOU.name: HANGZHOU}
+DEFAULT_POLICY = HANGZHOU.name
+
+
+def register_policy(policy):
+    """添加或替换一个政策"""
+    POLICIES[policy.name] = policy
+    return policy
+
+
+def get_policy(name=None):
+    """按名称取政策，None 时为默认政策；名称未知时抛出 ValueError"""
+    name = name or DEFAULT_POLICY
+    if name not in POLICIES:
+        raise ValueError(f"Unknown policy: {name}")
+    return POLICIES[name]
+
+
+@lru_cache(maxsize=None)
+def bracket_arrays(policy):
+    """税率表的 (级距上限, 税率, 速算扣除数) 数组，每个政策只构建一次"""
+    thresholds, rates, deductions = zip(*policy.tax_brackets)
+    return (
+        np.array(thresholds, dtype=float),
+        np.array(rates),
+        np.array(deductions, dtype=float),
+    )
+
+
+# 批量计算的输入字段及默认值（与 /api/calculate 相同）
+BATCH_INPUTS = {
+    "monthly_salary": 30000,
+    "annual_months": 13,
+    "social_insurance_base": 4812,
+    "housing_fund_base": 30000,
+    "special_deduction": 0,
+}
+
+# 批量计算输出的列
+BATCH_COLUMNS = [
+    "monthly_salary",
+    "annual_months",
+    "annual_income",
+    "personal_monthly_total",
+    "personal_annual_total",
+    "company_monthly_total",
+    "company_annual_total",
+    "taxable_income",
+    "applied_rate",
+    "deduction_amount",
+    "annual_tax",
+    "after_tax_income",
+    "monthly_after_tax",
+    "annual_company_cost",
+    "monthly_company_cost",
+    "total_social_insurance",
+    "total_housing_fund",
+    "total_cash_benefit",
+]
+
+# 未指定 fields 时返回的列，fields="all" 返回全部列
+DEFAULT_BATCH_FIELDS = [
+    "monthly_salary",
+    "annual_months",
+    "taxable_income",
+    "applied_rate",
+    "annual_tax",
+    "after_tax_income",
+    "annual_company_cost",
+]
+
+# 反解月薪时可以指定的目标
+SOLVE_TARGETS = ("after_tax_income", "annual_company_cost")
+
+# 薪资曲线每条曲线最多的点数（不含插入的税率跳变点）
+MAX_SWEEP_POINTS = 10000
+
+# 薪资曲线未指定 fields 时返回的列（月薪在各曲线间共用，单独返回）
+DEFAULT_SWEEP_FIELDS = [
+    "annual_tax",
+    "after_tax_income",
+    "monthly_after_tax",
+    "annual_company_cost",
+    "marginal_rate",
+]
+
+
+def lookup_brackets(taxable_income, policy=HANGZHOU, side="left"):
+    """
+    按应纳税所得额查找税率档位，返回 (税率, 速算扣除数) 数组
+
+    与逐档判断 taxable_income <= threshold 等价：searchsorted 的 side="left"
+    返回第一个不小于 taxable_income 的级距上限。side="right" 时恰好等于
+    级距上限的所得额归入上一档，即所得额再增加时适用的档位。
+    """
+    thresholds, rates, deductions = bracket_arrays(policy)
+    index = np.searchsorted(thresholds, taxable_income, side=side)
+    return rates[index], deductions[index]
+
+
+def contribution_items(social_insurance_base, housing_fund_base, policy=HANGZHOU):
+    """
+    社保公积金各项的每月缴纳额
+
+    返回 (个人部分, 公司部分)，各为 项目名 -> 金额 的字典，
+    参数可以是数组或标量。
+    """
+    personal = {
+        "monthly_pension": social_insurance_base * policy.pension_ins_rate_personal,
+        "monthly_medical": social_insurance_base * policy.medical_ins_rate_personal,
+        "monthly_unemployment": social_insurance_base
+        * policy.unemployment_ins_rate_personal,
+        "monthly_housing_fund": housing_fund_base * policy.housing_fund_rate_personal,
+    }
+    company = {
+        "monthly_pension": social_insurance_base * policy.pension_ins_rate_company,
+        "monthly_medical": social_insurance_base * policy.medical_ins_rate_company,
+        "monthly_unemployment": social_insurance_base
+        * policy.unemployment_ins_rate_company,
+        "monthly_injury": social_insurance_base * policy.injury_ins_rate_company,
+        "monthly_housing_fund": housing_fund_base * policy.housing_fund_rate_company,
+    }
+    return personal, company
+
+
+def calculate_batch(
+    monthly_salary,
+    annual_months,
+    social_insurance_base,
+    housing_fund_base,
+    special_deduction,
+    policy=HANGZHOU,
+):
+    """
+    向量化计算一组场景的个人所得税和公司用人成本
+
+    各参数可以是数组或标量，按 NumPy 规则广播；返回 列名 -> 数组 的字典，
+    各列含义与 calculate_tax_and_cost 返回结果中的同名字段一致。
+    policy 为缴纳比例和税率表，缺省为杭州政策。
+    """
+    monthly_salary, annual_months, si_base, hf_base, special_deduction = (
+        np.broadcast_arrays(
+            *(
+                np.asarray(v, dtype=float)
+                for v in (
+                    monthly_salary,
+                    annual_months,
+                    social_insurance_base,
+                    housing_fund_base,
+                    special_deduction,
+                )
+            )
+        )
+    )
+
+    # 1. 个人每月专项扣除（社保公积金个人部分）
+    personal, company = contribution_items(si_base, hf_base, policy)
+    monthly_social_insurance_personal = (
+        personal["monthly_pension"]
+        + personal["monthly_medical"]
+        + personal["monthly_unemployment"]
+    )
+    monthly_housing_fund_personal = personal["monthly_housing_fund"]
+    personal_monthly_total = (
+        monthly_social_insurance_personal + monthly_housing_fund_personal
+    )
+    personal_annual_total = personal_monthly_total * 12
+
+    # 2. 全年收入与应纳税所得额
+    annual_income = monthly_salary * annual_months
+    taxable_income = np.maximum(
+        0.0,
+        annual_income
+        - policy.basic_deduction
+        - personal_annual_total
+        - special_deduction,
+    )
+
+    # 3. 全年个人所得税
+    applied_rate, deduction_amount = lookup_brackets(taxable_income, policy)
+    annual_tax = taxable_income * applied_rate - deduction_amount
+    after_tax_income = annual_income - personal_annual_total - annual_tax
+
+    # 4. 公司用人成本
+    monthly_social_insurance_company = (
+        company["monthly_pension"]
+        + company["monthly_medical"]
+        + company["monthly_unemployment"]
+        + company["monthly_injury"]
+    )
+    monthly_housing_fund_company = company["monthly_housing_fund"]
+    company_monthly_total = (
+        monthly_social_insurance_company + monthly_housing_fund_company
+    )
+    annual_company_cost = company_monthly_total * 12 + annual_income
+    total_housing_fund = (
+        monthly_housing_fund_personal + monthly_housing_fund_company
+    ) * 12
+
+    return {
+        "monthly_salary": monthly_salary,
+        "annual_months": annual_months,
+        "annual_income": annual_income,
+        "personal_monthly_total": personal_monthly_total,
+        "personal_annual_total": personal_annual_total,
+        "company_monthly_total": company_monthly_total,
+        "company_annual_total": company_monthly_total * 12,
+        "taxable_income": taxable_income,
+        "applied_rate": applied_rate,
+        "deduction_amount": deduction_amount,
+        "annual_tax": annual_tax,
+        "after_tax_income": after_tax_income,
+        "monthly_after_tax": after_tax_income / 12,
+        "annual_company_cost": annual_company_cost,
+        "monthly_company_cost": annual_company_cost / 12,
+        "total_social_insurance": (
+            monthly_social_insurance_personal + monthly_social_insurance_company
+        )
+        * 12,
+        "total_housing_fund": total_housing_fund,
+        "total_cash_benefit": after_tax_income + total_housing_fund,
+    }
+
+
+def sweep_salaries(
+    salary_min,
+    salary_max,
+    step,
+    annual_months=BATCH_INPUTS["annual_months"],
+    social_insurance_base=BATCH_INPUTS["social_insurance_base"],
+    housing_fund_base=BATCH_INPUTS["housing_fund_base"],
+    special_deduction=BATCH_INPUTS["special_deduction"],
+    policy=HANGZHOU,
+):
+    """
+    计算月薪从 salary_min 到 salary_max（步长 step）的收入曲线
+
+    annual_months 可以是一个值或一组值，每个值对应一条曲线，所有曲线在同一个
+    (曲线数, 点数) 网格上一次计算完成。边际税率跳变的月薪（应纳税所得额恰好
+    等于某档上限，或开始大于 0）会插入网格，曲线在拐点处是准确的。
+
+    返回 (月薪数组, 月数数组, 列名 -> (曲线数, 点数) 数组, 跳变点列表)；
+    结果额外包含 marginal_rate 列：月薪再增加时适用的税率，在跳变点上等于
+    跳变点的 rate_above（应纳税所得额为 0 且不在跳变点上时为 0）。
+    """
+    if step <= 0:
+        raise ValueError("step must be positive")
+    if salary_max < salary_min:
+        raise ValueError("salary_max must not be less than salary_min")
+    count = int(np.floor((salary_max - salary_min) / step + 1e-9)) + 1
+    if count > MAX_SWEEP_POINTS:
+        raise ValueError(
+            f"Sweep has {count} points, at most {MAX_SWEEP_POINTS} are allowed"
+        )
+    months = np.atleast_1d(np.asarray(annual_months, dtype=float))
+    if months.ndim > 1 or np.any(months <= 0):
+        raise ValueError("annual_months must be a positive number or list of numbers")
+
+    # 应纳税所得额 = 月薪 * 月数 - 减除费用 - 专项扣除 - 专项附加扣除，
+    # 令其等于 0 和各档上限，反解出跳变点的月薪
+    personal_annual_total = calculate_batch(
+        0, 0, social_insurance_base, housing_fund_base, 0, policy
+    )["personal_annual_total"]
+    thresholds, rates, _ = bracket_arrays(policy)
+    limits = np.concatenate(([0.0], thresholds[:-1]))
+    rates_below = np.concatenate(([0.0], rates[:-1]))
+    boundary_salaries = (
+        limits[None, :]
+        + policy.basic_deduction
+        + personal_annual_total
+        + special_deduction
+    ) / months[:, None]
+
+    boundaries = []
+    kinks = []
+    for i, j in zip(*np.nonzero(boundary_salaries >= salary_min)):
+        salary = round(float(boundary_salaries[i, j]), 2)
+        if salary <= salary_max:
+            boundaries.append(
+                {
+                    "annual_months": float(months[i]),
+                    "monthly_salary": salary,
+                    "taxable_income": float(limits[j]),
+                    "rate_below": float(rates_below[j]),
+                    "rate_above": float(rates[j]),
+                }
+            )
+            kinks.append((i, salary, float(rates[j])))
+
+    salaries = np.round(salary_min + step * np.arange(count), 2)
+    salaries = np.union1d(salaries, [b["monthly_salary"] for b in boundaries])
+
+    results = calculate_batch(
+        salaries[None, :],
+        months[:, None],
+        social_insurance_base,
+        housing_fund_base,
+        special_deduction,
+        policy,
+    )
+    marginal_rate, _ = lookup_brackets(results["taxable_income"], policy, side="right")
+    marginal_rate = np.where(results["taxable_income"] > 0, marginal_rate, 0.0)
+    # 插入的跳变点月薪保留了两位小数，可能略低于精确的跳变点，直接取跳变后的税率
+    for i, salary, rate_above in kinks:
+        marginal_rate[i, np.searchsorted(salaries, salary)] = rate_above
+    results["marginal_rate"] = marginal_rate
+    return salaries, months, results, boundaries
+
+
+def solve_monthly_salary(
+    target,
+    value,
+    annual_months=BATCH_INPUTS["annual_months"],
+    social_insurance_base=BATCH_INPUTS["social_insurance_base"],
+    housing_fund_base=BATCH_INPUTS["housing_fund_base"],
+    special_deduction=BATCH_INPUTS["special_deduction"],
+    policy=HANGZHOU,
+):
+    """
+    反解月薪：税后年收入（target="after_tax_income"）或公司年成本
+    （target="annual_company_cost"）等于 value 时的月薪，各参数可以是数组或标量
+
+    两者都是月薪的分段线性函数，按段直接求解，不需要迭代：
+    公司年成本 = 月薪 * 月数 + 公司社保公积金；
+    记 C = 减除费用 + 个人社保公积金 + 专项附加扣除，应纳税所得额为 0 时
+    税后年收入 = 月薪 * 月数 - 个人社保公积金，落在税率 r、速算扣除数 q 的档位时
+    税后年收入 = 月薪 * 月数 * (1 - r) + r * C + q - 个人社保公积金。
+    先算出各档上限处的税后年收入，searchsorted 找到 value 所在的段再代入求解。
+
+    目标低于月薪为 0 时的值（无法达到）时抛出 ValueError。
+    """
+    if target not in SOLVE_TARGETS:
+        raise ValueError(f"target must be one of {', '.join(SOLVE_TARGETS)}")
+    value, annual_months, si_base, hf_base, special_deduction = np.broadcast_arrays(
+        *(
+            np.asarray(v, dtype=float)
+            for v in (
+                value,
+                annual_months,
+                social_insurance_base,
+                housing_fund_base,
+                special_deduction,
+            )
+        )
+    )
+    if np.any(annual_months <= 0):
+        raise ValueError("annual_months must be positive")
+    fixed = calculate_batch(0, annual_months, si_base, hf_base, 0, policy)
+
+    if target == "annual_company_cost":
+        floor = fixed["company_annual_total"]
+        if np.any(value < floor):
+            raise ValueError(
+                f"{np.count_nonzero(value < floor)} targets are below the "
+                "company insurance cost at zero salary"
+            )
+        return (value - floor) / annual_months
+
+    personal_annual_total = fixed["personal_annual_total"]
+    if np.any(value < -personal_annual_total):
+        raise ValueError(
+            f"{np.count_nonzero(value < -personal_annual_total)} targets are below "
+            "the after-tax income at zero salary"
+        )
+    offset = policy.basic_deduction + personal_annual_total + special_deduction
+
+    # 应纳税所得额为 0 和各档上限处的税后年收入，(..., 档位数) 数组
+    thresholds, rates, deductions = bracket_arrays(policy)
+    limits = np.concatenate(([0.0], thresholds[:-1]))
+    limit_rates, limit_deductions = lookup_brackets(limits, policy)
+    limit_after_tax = (
+        limits
+        + offset[..., None]
+        - personal_annual_total[..., None]
+        - (limits * limit_rates - limit_deductions)
+    )
+
+    # segment 为 0 时应纳税所得额为 0，否则落在第 segment - 1 档
+    segment = np.sum(limit_after_tax < value[..., None], axis=-1)
+    rate = np.where(segment > 0, rates[np.maximum(segment - 1, 0)], 0.0)
+    deduction = np.where(segment > 0, deductions[np.maximum(segment - 1, 0)], 0.0)
+    return (value + personal_annual_total - rate * offset - deduction) / (
+        annual_months * (1 - rate)
+    )
+
+
+def parse_solve_inputs(data):
+    """
+    从请求 JSON 中读取反解输入：SOLVE_TARGETS 中恰好一个字段给出目标值，
+    其余字段与 parse_batch_inputs 相同（不含 monthly_salary），返回 (目标, 输入字典)
+    """
+    targets = [name for name in SOLVE_TARGETS if name in data]
+    if len(targets) != 1:
+        raise ValueError(f"Specify exactly one of {', '.join(SOLVE_TARGETS)}")
+    target = targets[0]
+    defaults = {target: data[target]}
+    defaults.update((k, v) for k, v in BATCH_INPUTS.items() if k != "monthly_salary")
+    inputs = parse_batch_inputs(data, defaults)
+    inputs["value"] = inputs.pop(target)
+    return target, inputs
+
+
+def parse_batch_inputs(data, defaults=BATCH_INPUTS):
+    """
+    从请求 JSON 中读取批量输入：每个字段可以是数组或标量，缺省时使用默认值
+
+    defaults 为 字段 -> 默认值；所有数组字段的长度必须相同，否则抛出 ValueError。
+    """
+    inputs = {}
+    length = None
+    for name, default in defaults.items():
+        value = np.asarray(data.get(name, default), dtype=float)
+        if value.ndim > 1:
+            raise ValueError(f"{name} must be a number or a list of numbers")
+        if value.ndim == 1:
+            if length is not None and value.size != length:
+                raise ValueError(f"{name} has {value.size} values, expected {length}")
+            length = value.size
+        inputs[name] = value
+    return inputs
+
+
+def to_columns(results, fields=None, decimals=2):
+    """
+    转换为列式 JSON：列名 -> 列表，金额保留 decimals 位小数
+
+    fields 为列名列表、单个列名或 "all"，缺省为 DEFAULT_BATCH_FIELDS。
+
+    序列化的主要开销在于浮点数转字符串，全为整数的列（如月薪、月数）按整数输出。
+    """
+    fields = fields or DEFAULT_BATCH_FIELDS
+    if fields == "all":
+        fields = BATCH_COLUMNS
+    elif isinstance(fields, str):
+        # 单个列名
+        fields = [fields]
+    elif not isinstance(fields, (list, tuple)) or not all(
+        isinstance(f, str) for f in fields
+    ):
+        raise ValueError('fields must be "all", a field name or a list of field names')
+    unknown = [f for f in fields if f not in results]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    columns = {}
+    for name in fields:
+        column = np.round(np.atleast_1d(results[name]), decimals)
+        integral = np.rint(column)
+        if np.array_equal(column, integral):
+            column = integral.astype(np.int64)
+        columns[name] = column.tolist()
+    return columns